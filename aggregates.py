@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Running group statistics over the results database.
+
+Every row appended to the CSV database also updates a small JSON sidecar
+(<database>_stats.json) holding, for each grouping and group, the count,
+the running mean and M2 (Welford) of the result metrics and a histogram of
+the duty cycle. Trend queries read only the sidecar, so they cost the same
+for ten analyses as for ten thousand. The sidecar is rebuilt from the CSV
+once when it is missing or when the CSV was changed outside this program.
+"""
+import csv
+import json
+import math
+import os
+
+import numpy as np
+
+# Groupings offered to the trend queries: name -> database columns forming the group key
+GROUPINGS = {
+    "Applied Voltage": ("Applied Voltage (mV)",),
+    "Chip": ("Chip#",),
+    "Pulse Shape": ("Ramp Up Duration (ms)", "Ramp Down Duration (ms)", "Flat Duration (ms)"),
+    "Voltage and Pulse": ("Applied Voltage (mV)", "Ramp Up Duration (ms)", "Ramp Down Duration (ms)", "Flat Duration (ms)"),
+    "Chip, Voltage and Pulse": ("Chip#", "Applied Voltage (mV)", "Ramp Up Duration (ms)", "Ramp Down Duration (ms)", "Flat Duration (ms)"),
+}
+
+METRICS = ("Mean Duty Cycle", "Mean Odd Region Width (µm)", "Mean Even Region Width (µm)")
+
+# Duty cycle histogram bins, shared by all groups
+HISTOGRAM_EDGES = np.linspace(0, 1, 41)
+
+
+def stats_path(csv_file):
+    return f"{os.path.splitext(csv_file)[0]}_stats.json"
+
+
+def _metric_value(row, metric):
+    # Database files written on Windows may have a mangled µ in the header, match on the prefix
+    prefix = metric.split(" (")[0]
+    for column, value in row.items():
+        if column is not None and column.split(" (")[0] == prefix:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None
+            return value if math.isfinite(value) else None
+    return None
+
+
+class AggregateStore:
+    def __init__(self, csv_file):
+        self.csv_file = csv_file
+        self.path = stats_path(csv_file)
+        self.groups = {name: {} for name in GROUPINGS}
+        self.database_size = 0
+        if not self.load():
+            self.rebuild()
+
+    def load(self):
+        # Use the sidecar only if it describes the database as it is now
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as stats_file:
+                stored = json.load(stats_file)
+        except (OSError, ValueError) as e:
+            # Truncated or corrupt sidecar: treat it as missing, it is rebuilt from the CSV
+            print(f"Ignoring unreadable aggregate statistics {self.path}: {e}")
+            return False
+        if not isinstance(stored, dict) or not isinstance(stored.get("groups"), dict):
+            return False
+        current_size = os.path.getsize(self.csv_file) if os.path.exists(self.csv_file) else 0
+        if stored.get("database_size") != current_size or set(stored["groups"]) != set(GROUPINGS):
+            return False
+        self.groups = stored["groups"]
+        self.database_size = current_size
+        return True
+
+    def save(self):
+        self.database_size = os.path.getsize(self.csv_file) if os.path.exists(self.csv_file) else 0
+        # Write a temporary file and swap it in, so an interrupted save cannot leave a truncated sidecar
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'w') as stats_file:
+            json.dump({"database_size": self.database_size, "groups": self.groups}, stats_file)
+        os.replace(temporary_path, self.path)
+
+    def rebuild(self):
+        print(f"Building aggregate statistics from {self.csv_file}")
+        self.groups = {name: {} for name in GROUPINGS}
+        if os.path.exists(self.csv_file):
+            with open(self.csv_file, newline='', errors='replace') as csvfile:
+                for row in csv.DictReader(csvfile):
+                    self.update(row)
+        self.save()
+
+    def update(self, row):
+        duty_cycle = _metric_value(row, "Mean Duty Cycle")
+        for name, columns in GROUPINGS.items():
+            key = " | ".join(str(row.get(column, "")).strip() for column in columns)
+            group = self.groups[name].setdefault(key, {
+                "count": 0,
+                "metrics": {metric: {"count": 0, "mean": 0.0, "m2": 0.0} for metric in METRICS},
+                "histogram": [0] * (len(HISTOGRAM_EDGES) - 1),
+            })
+            group["count"] += 1
+            for metric in METRICS:
+                value = _metric_value(row, metric)
+                if value is None:
+                    continue
+                # Welford's update
+                stats = group["metrics"][metric]
+                stats["count"] += 1
+                delta = value - stats["mean"]
+                stats["mean"] += delta / stats["count"]
+                stats["m2"] += delta * (value - stats["mean"])
+            if duty_cycle is not None:
+                index = int(np.clip(np.searchsorted(HISTOGRAM_EDGES, duty_cycle, side='right') - 1, 0, len(HISTOGRAM_EDGES) - 2))
+                group["histogram"][index] += 1
+
+    def query(self, grouping, metric="Mean Duty Cycle"):
+        """Return [(key, count, mean, std), ...] for every group of `grouping`, sorted by key.
+
+        std is the population standard deviation of the metric within the group.
+        """
+        rows = []
+        for key, group in self.groups[grouping].items():
+            stats = group["metrics"][metric]
+            if stats["count"] == 0:
+                continue
+            rows.append((key, stats["count"], stats["mean"], math.sqrt(stats["m2"] / stats["count"])))
+        return sorted(rows, key=lambda row: _sort_key(row[0]))
+
+    def histogram(self, grouping, key=None):
+        # Duty cycle histogram of one group, or of all groups of the grouping together
+        if key is not None:
+            return np.array(self.groups[grouping][key]["histogram"]), HISTOGRAM_EDGES
+        counts = np.zeros(len(HISTOGRAM_EDGES) - 1, dtype=int)
+        for group in self.groups[grouping].values():
+            counts += np.array(group["histogram"])
+        return counts, HISTOGRAM_EDGES
+
+
+def _sort_key(key):
+    # Numeric order for numeric keys ("10" after "9"), text order otherwise
+    parts = []
+    for part in key.split(" | "):
+        try:
+            parts.append((0, float(part), ""))
+        except ValueError:
+            parts.append((1, 0.0, part))
+    return parts
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Poling analysis engines.
+
+Every engine takes a (vertically averaged) line profile and returns a results
+dictionary with the same keys, so the controller, the plot panel and
+save_results do not need to know which engine produced them:
+
+    odd_region_widths, even_region_widths, odd_mean, odd_std, even_mean,
+    even_std, duty_cycle, duty_cycle_mean, duty_cycle_std, minima_indices
+
+Widths are in microns when a calibration factor is given, otherwise in pixels.
+"""
+import time
+import numpy as np
+
+# Shortest line profile (in samples) the engines accept: the Fourier engine
+# ignores periods longer than a quarter of the profile and needs a few of them
+MIN_PROFILE_LENGTH = 16
+
+
+def _summarize(odd_region_widths, even_region_widths, duty_cycle, minima_indices):
+    return {
+        "odd_region_widths": odd_region_widths,
+        "even_region_widths": even_region_widths,
+        "odd_mean": np.mean(odd_region_widths),
+        "odd_std": np.std(odd_region_widths),
+        "even_mean": np.mean(even_region_widths),
+        "even_std": np.std(even_region_widths),
+        "duty_cycle": duty_cycle,
+        "duty_cycle_mean": np.mean(duty_cycle),
+        "duty_cycle_std": np.std(duty_cycle),
+        "minima_indices": minima_indices,
+    }
+
+
+def analyze_minima(line_profile, calibration_factor=None, prominence=10):
+    from scipy.signal import find_peaks
+
+    # Find the prominent minima in the line profile
+    minima_indices, _ = find_peaks(-line_profile, prominence=prominence)
+
+    # Calculate the width of each region in pixels
+    region_widths = np.diff(minima_indices)
+
+    # Convert region widths to microns using the calibration factor
+    if calibration_factor:
+        region_widths = region_widths * calibration_factor
+
+    # Separate the widths into odd (actively poled) and even (passively poled) regions
+    odd_region_widths = region_widths[::2]
+    even_region_widths = region_widths[1::2]
+
+    # Truncate to make sure odd and even regions have the same number of elements
+    min_length = min(len(odd_region_widths), len(even_region_widths))
+    odd_region_widths = odd_region_widths[:min_length]
+    even_region_widths = even_region_widths[:min_length]
+
+    # Duty cycle is odd_region_width / (odd_region_width + even_region_width)
+    duty_cycle = odd_region_widths / (odd_region_widths + even_region_widths)
+
+    return _summarize(odd_region_widths, even_region_widths, duty_cycle, minima_indices)
+
+
+def _peak_frequency(spectrum, lo, hi):
+    # Parabolic interpolation of the largest bin of each row inside [lo, hi)
+    band = spectrum[..., lo:hi]
+    k = np.argmax(band, axis=-1)
+    if band.shape[-1] < 3:
+        return lo + k
+    k = np.clip(k, 1, band.shape[-1] - 2)
+    left = np.take_along_axis(band, (k - 1)[..., None], axis=-1)[..., 0]
+    centre = np.take_along_axis(band, k[..., None], axis=-1)[..., 0]
+    right = np.take_along_axis(band, (k + 1)[..., None], axis=-1)[..., 0]
+    denominator = left - 2 * centre + right
+    delta = np.where(denominator != 0, 0.5 * (left - right) / np.where(denominator != 0, denominator, 1), 0)
+    return lo + k + np.clip(delta, -1, 1)  # The largest bin may sit on the edge of the band
+
+
+def _fundamental(profile, harmonic_ratio, noise_ratio=2, max_harmonic=8):
+    # Global period estimate. Narrow dips put a lot of power into the
+    # harmonics (and near 50% duty cycle the fundamental almost vanishes), so
+    # the strongest peak is taken as the fundamental only when the profile
+    # shows no sign of a longer period. A grating whose period is `harmonic`
+    # times the dominant one has lines at the multiples of k_dominant / harmonic
+    # that are coprime with `harmonic` (near 50% the odd harmonics are usually
+    # stronger than the fundamental itself). Their rms amplitude has to stand
+    # out from both the leakage of the dominant peak and the noise floor, so a
+    # single noisy bin cannot pass for a subharmonic.
+    n = len(profile)
+    nfft = 4 * n
+    spectrum = np.abs(np.fft.rfft((profile - np.mean(profile)) * np.hanning(n), nfft))
+    lo = max(2, int(4 * nfft / n))  # Ignore slow background variations
+    k_dominant = _peak_frequency(np.log(spectrum + 1e-12), lo, len(spectrum))
+    peak = spectrum[int(round(k_dominant))]
+    noise = np.sqrt(np.median(spectrum ** 2) / np.log(2))  # Rms of a bin with noise only
+    for harmonic in range(max_harmonic, 1, -1):
+        orders = np.arange(1, 4 * harmonic)
+        orders = orders[np.gcd(orders, harmonic) == 1]
+        k_lines = np.round(orders * k_dominant / harmonic).astype(int)
+        k_lines = k_lines[(k_lines > lo) & (k_lines < len(spectrum) - 2)]
+        if len(k_lines) == 0:
+            continue
+        # Only a local maximum counts, not the skirt of a neighbouring line
+        near = spectrum[k_lines[:, None] + np.arange(-2, 3)]
+        interior = np.isin(np.argmax(near, axis=1), (1, 2, 3))
+        amplitudes = np.where(interior, near.max(axis=1), 0)
+        rms = np.sqrt(np.mean(amplitudes ** 2))
+        if rms > harmonic_ratio * peak and rms > noise_ratio * noise:
+            return nfft / k_dominant * harmonic, harmonic
+    return nfft / k_dominant, 1
+
+
+def _fold(windows, periods, n_bins):
+    # Epoch folding: average every window over the phase of its own period
+    n_windows, window_length = windows.shape
+    positions = np.arange(window_length)
+    bins = (np.mod(positions[None, :], periods[:, None]) / periods[:, None] * n_bins).astype(int) % n_bins
+    flat = (np.arange(n_windows)[:, None] * n_bins + bins).ravel()
+    sums = np.bincount(flat, weights=windows.ravel(), minlength=n_windows * n_bins).reshape(-1, n_bins)
+    counts = np.bincount(flat, minlength=n_windows * n_bins).reshape(-1, n_bins)
+    folded = sums / np.maximum(counts, 1)
+
+    # When the period is close to a whole number of samples, only a few phases
+    # get samples. Fill the empty bins by circular linear interpolation between
+    # their filled neighbours rather than with a constant, which would add dips.
+    filled = counts > 0
+    index = np.arange(3 * n_bins)
+    previous = np.maximum.accumulate(np.where(np.tile(filled, 3), index, -1), axis=1)[:, n_bins:2 * n_bins]
+    following = np.minimum.accumulate(np.where(np.tile(filled, 3), index, 3 * n_bins)[:, ::-1], axis=1)[:, ::-1][:, n_bins:2 * n_bins]
+    tiled = np.tile(folded, 3)
+    left = np.take_along_axis(tiled, previous, axis=1)
+    right = np.take_along_axis(tiled, following, axis=1)
+    weight = (index[n_bins:2 * n_bins] - previous) / np.maximum(following - previous, 1)
+    folded = np.where(filled, folded, left + weight * (right - left))
+
+    return (np.roll(folded, 1, axis=1) + 2 * folded + np.roll(folded, -1, axis=1)) / 4
+
+
+def _dips(folded):
+    # Positions (in bins) of the deepest dip of each folded window and of the
+    # deepest other local minimum at least 10% of a period away from it, and
+    # the prominence of that second dip relative to the depth of the fold. A
+    # second dip has to be separated from the first by maxima on both sides,
+    # or it is just the first dip smeared by noise.
+    n_bins = folded.shape[1]
+    first = np.argmin(folded, axis=1)
+    circular_distance = np.abs((np.arange(n_bins)[None, :] - first[:, None] + n_bins // 2) % n_bins - n_bins // 2)
+    local_minimum = (folded <= np.roll(folded, 1, axis=1)) & (folded <= np.roll(folded, -1, axis=1))
+    masked = np.where(local_minimum & (circular_distance > 0.1 * n_bins), folded, np.inf)
+    second = np.argmin(masked, axis=1)
+    has_second = np.isfinite(np.min(masked, axis=1))
+
+    def refine(index):
+        left = np.take_along_axis(folded, ((index - 1) % n_bins)[:, None], axis=1)[:, 0]
+        centre = np.take_along_axis(folded, index[:, None], axis=1)[:, 0]
+        right = np.take_along_axis(folded, ((index + 1) % n_bins)[:, None], axis=1)[:, 0]
+        denominator = left - 2 * centre + right
+        return index + np.where(denominator > 0, 0.5 * (left - right) / np.where(denominator > 0, denominator, 1), 0)
+
+    depth = np.max(folded, axis=1) - np.min(folded, axis=1)
+    offset = (np.arange(n_bins)[None, :] - first[:, None]) % n_bins
+    second_offset = ((second - first) % n_bins)[:, None]
+    between = np.max(np.where((offset > 0) & (offset < second_offset), folded, -np.inf), axis=1)
+    beyond = np.max(np.where(offset > second_offset, folded, -np.inf), axis=1)
+    prominence = np.minimum(between, beyond) - np.take_along_axis(folded, second[:, None], axis=1)[:, 0]
+    prominence = np.where(has_second, prominence / np.maximum(depth, 1e-12), 0)
+    return np.mod(refine(first), n_bins), np.mod(refine(second), n_bins), prominence
+
+
+def analyze_fourier(line_profile, calibration_factor=None, periods_per_window=8, harmonic_ratio=0.05):
+    """Estimate local period and duty cycle without picking individual minima.
+
+    The profile is split into overlapping windows of `periods_per_window`
+    periods. In each window the local period is refined from the windowed FFT
+    peak, and the window is folded (epoch folding) at that period so that all
+    dips of the same kind stack on top of each other. The separation of the two
+    dips in the folded waveform gives the odd and even region widths. A missed
+    or spurious minimum therefore only blurs one window instead of shifting the
+    odd/even pairing for the rest of the grating.
+
+    The returned widths and duty cycle are one value per window rather than
+    one per region pair, so their std is that of window averages.
+    """
+    profile = np.asarray(line_profile, dtype=float)
+    n = len(profile)
+    if n < MIN_PROFILE_LENGTH:
+        raise ValueError(f"Line profile too short for the Fourier engine: {n} samples, at least {MIN_PROFILE_LENGTH} needed")
+    period, harmonic = _fundamental(profile, harmonic_ratio)
+
+    # Overlapping windows, one row each (hop of half a window)
+    window_length = min(n, max(int(round(periods_per_window * period)), 4))
+    hop = max(window_length // 2, 1)
+    windows = np.lib.stride_tricks.sliding_window_view(profile, window_length)[::hop]
+    windows = windows - windows.mean(axis=1, keepdims=True)
+
+    # Local period from the windowed FFT peak around the dominant harmonic
+    nfft = 4 * window_length
+    spectra = np.log(np.abs(np.fft.rfft(windows * np.hanning(window_length), nfft, axis=1)) + 1e-12)
+    k_expected = harmonic * nfft / period
+    tolerance = min(0.2, 0.4 / harmonic)  # Stay clear of the neighbouring harmonics
+    lo = max(int(k_expected * (1 - tolerance)), 1)
+    hi = min(int(np.ceil(k_expected * (1 + tolerance))) + 1, spectra.shape[1])
+    local_period = harmonic * nfft / _peak_frequency(spectra, lo, hi)
+
+    # Fold every window at its own period
+    # Half-sample bins, but with at least a few samples per bin on average so
+    # that the folded waveform is not just noise
+    n_bins = int(np.clip(min(round(2 * period), window_length // 4), 8, 128))
+    first_position, second_position, prominence = _dips(_fold(windows, local_period, n_bins))
+
+    # Only one dip per fold (decided on the whole profile, noisy windows
+    # disagree): the dominant period is half the true one, which happens when
+    # the duty cycle is close to 50% and the fundamental cancels out. Fold
+    # again at twice the local period to separate the two kinds of dips.
+    if np.median(prominence) < 0.4:
+        local_period = 2 * local_period
+        n_bins = int(np.clip(min(round(4 * period), window_length // 4), 8, 128))
+        first_position, second_position, _ = _dips(_fold(windows, local_period, n_bins))
+
+    # Odd regions start at the first dip of the profile. Follow that dip from
+    # window to window (they overlap by half) and measure the duty cycle from it.
+    first_position = first_position / n_bins * local_period
+    second_position = second_position / n_bins * local_period
+    odd_start = min(first_position[0], second_position[0])
+    duty_cycle = np.empty(len(windows))
+    for i in range(len(windows)):
+        start = i * hop
+        distance = [np.abs((start + position[i] - odd_start + local_period[i] / 2) % local_period[i] - local_period[i] / 2)
+                    for position in (first_position, second_position)]
+        this, other = (first_position, second_position) if distance[0] <= distance[1] else (second_position, first_position)
+        odd_start = start + this[i]
+        duty_cycle[i] = ((other[i] - this[i]) % local_period[i]) / local_period[i]
+
+    odd_region_widths = duty_cycle * local_period
+    even_region_widths = (1 - duty_cycle) * local_period
+    if calibration_factor:
+        odd_region_widths = odd_region_widths * calibration_factor
+        even_region_widths = even_region_widths * calibration_factor
+
+    return _summarize(odd_region_widths, even_region_widths, duty_cycle, None)
+
+
+ENGINES = {
+    "Minima": analyze_minima,
+    "Fourier": analyze_fourier,
+}
+
+
+def run_engine(name, line_profile, calibration_factor=None, prominence=10):
+    if name == "Minima":
+        return analyze_minima(line_profile, calibration_factor, prominence=prominence)
+    return ENGINES[name](line_profile, calibration_factor)
+
+
+def compare_engines(line_profile, calibration_factor=None, prominence=10):
+    # Run every engine on the same profile and time it
+    import scipy.signal  # noqa: F401 -- loaded by the Minima engine on first use, keep it out of its time
+    comparison = {}
+    for name in ENGINES:
+        start = time.perf_counter()
+        results = run_engine(name, line_profile, calibration_factor, prominence)
+        comparison[name] = (results, time.perf_counter() - start)
+    return comparison
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Unattended analysis of a whole directory of images with a saved recipe.
+
+The per-image data and the database rows are written as each image is
+analyzed. The plots are rendered afterwards for the whole run in parallel by
+the report generator, which also writes <directory>/report/index.html.
+
+Usage:
+    python batch.py recipe.ini path/to/images [--database results.csv] [--overwrite] [--processes N]
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+
+import analysis
+import report
+import results_io
+from model import ImageModel
+from recipe import Recipe
+
+
+def analyze_image(recipe, file_path, model=None):
+    # Register the image against the recipe reference, then analyze the ROI
+    model = model or ImageModel()
+    image = model.load_image(file_path)
+    rotation_angle, (y1, y2) = recipe.register(image)
+    model.rotate_image(rotation_angle)
+
+    # The registered ROI may reach past the image edges: keep the rows inside it
+    height = model.rotated_image.size[1]
+    y1, y2 = max(y1, 0), min(y2, height)
+    if y2 <= y1:
+        raise ValueError(f"registered ROI rows {y1}-{y2} are outside the image")
+    line_profile = model.get_roi_profile(y1, y2, recipe.start_exclusion, recipe.end_exclusion)
+    results = analysis.run_engine(recipe.engine, line_profile, recipe.calibration_factor, recipe.prominence)
+    if not all(np.isfinite(results[key]) for key in ("odd_mean", "even_mean", "duty_cycle_mean")):
+        raise ValueError("no poling regions found in the ROI")
+    results["lines_averaged"] = y2 - y1
+    return rotation_angle, results
+
+
+def run_directory(recipe, directory, csv_file, pattern="*.tif", overwrite=False, description="Batch analysis", processes=None):
+    model = ImageModel()
+    processed = []
+    for file_path in sorted(glob.glob(os.path.join(directory, pattern))):
+        image_dir, image_file_name = os.path.split(file_path)
+        if not overwrite and any(os.path.exists(path) for path in results_io.output_paths(image_dir, image_file_name)):
+            print(f"Skipping {image_file_name}: already processed")
+            continue
+        try:
+            rotation_angle, results = analyze_image(recipe, file_path, model)
+        except Exception as e:
+            print(f"Error analyzing {image_file_name}: {e}")
+            continue
+        data = results_io.database_row(recipe.metadata, rotation_angle, image_file_name, results, description)
+        results_io.write_analysis_data(results_io.output_paths(image_dir, image_file_name)[2], results, bool(recipe.calibration_factor))
+        results_io.append_to_database(csv_file, data)
+        processed.append(image_file_name)
+    print(f"Batch analysis done: {len(processed)} image(s) processed")
+    report.generate_report(directory, processes=processes)
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a saved PPLN analysis recipe on a directory of images.")
+    parser.add_argument("recipe", help="Recipe file saved from the GUI")
+    parser.add_argument("directory", help="Directory with the images to analyze")
+    parser.add_argument("--database", default=None, help="CSV database (default: the location stored in config.ini)")
+    parser.add_argument("--pattern", default="*.tif", help="Glob pattern of the images (default: *.tif)")
+    parser.add_argument("--overwrite", action="store_true", help="Re-analyze images that already have results")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes for rendering the plots (default: one per CPU)")
+    args = parser.parse_args()
+
+    try:
+        recipe = Recipe.load(args.recipe)
+    except ValueError as error:
+        parser.error(str(error))
+    csv_file = args.database or results_io.load_database_location()
+    run_directory(recipe, args.directory, csv_file, pattern=args.pattern, overwrite=args.overwrite, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 from tkinter import filedialog, messagebox
-import matplotlib.pyplot as plt
 import numpy as np
-import csv
 import os
-from scipy.signal import find_peaks
-from datetime import datetime
-import configparser
-from skimage import io, color, feature, transform
+import aggregates
+import analysis
+import results_io
+from model import RunningRoiProfile
+
+# scipy, skimage and the batch/recipe modules are imported where they are
+# first used, so that the window appears without waiting for them.
 
 
 class ImageController:
@@ -23,20 +24,19 @@ class ImageController:
         self.image_file_name = None  # Store the image file name
         self.rotation_angle = 0  # Store the current rotation angle
         self.image_dir = None  # Directory where the image is located
+        self.image_path = None  # Full path of the loaded image (reference for recipes)
+        self.roi_rows = None  # ROI rows in rotated image pixels
+        self.running_profile = None  # Column sums of the ROI rows, updated incrementally while dragging
+        self._live_update_pending = False
         self.config_file = "config.ini"  # Configuration file to store settings
         self.csv_file = self.load_database_location()  # Load the stored database location
 
     
     def load_database_location(self):
-        config = configparser.ConfigParser()
-        if os.path.exists(self.config_file):  # Check if the config file exists
-            config.read(self.config_file)
-        if "Database" in config and "file" in config["Database"]:
-            return config["Database"]["file"]
-        else:
-            return "analysis_results.csv"  # Default file name
+        return results_io.load_database_location(self.config_file)
 
     def save_database_location(self, file_path):
+        import configparser
         config = configparser.ConfigParser()
         config["Database"] = {"file": file_path}
         with open(self.config_file, 'w') as configfile:
@@ -55,8 +55,15 @@ class ImageController:
         if file_path:
             self.image_file_name = os.path.basename(file_path)  # Save the image file name
             self.image_dir = os.path.dirname(file_path)  # Save the directory of the image file
+            self.image_path = file_path
             image = self.model.load_image(file_path)
             if image:
+                # The ROI, its handles and the results belong to the previous image
+                self.roi_rows = None
+                self.running_profile = None
+                self.line_profile = None
+                self.analysis_results = {}
+                self.view.clear_profile_lines()
                 self.view.display_image(image)
                 print(f"Image loaded and displayed: {file_path}")
 
@@ -68,14 +75,23 @@ class ImageController:
             print(f"Image rotated by {angle} degrees")
         self.view.update_rotation_entry(angle)
 
+    def rotation_slider_moved(self, value):
+        # The slider has a 0.1 degree resolution. When it is set from code to a
+        # more precise angle, Tk echoes the rounded value back here once the
+        # event loop is idle: keep the precise rotation instead of redoing it.
+        angle = float(value)
+        if abs(angle - float(self.rotation_angle)) <= float(self.view.rotation_slider.cget("resolution")) / 2:
+            return
+        self.rotate_image(angle)
+
     def update_rotation_slider(self, event):
         angle = self.view.rotation_entry.get()
         try:
             angle = float(angle)
-            self.rotation_angle = angle  # Save the rotation angle
-            self.view.rotation_slider.set(angle)
         except ValueError:
-            pass
+            return
+        self.rotate_image(angle)
+        self.view.rotation_slider.set(angle)
 
     def select_poling_roi(self):
         # Clear previous lines
@@ -133,152 +149,130 @@ class ImageController:
         y1, y2 = sorted(self.profile_region)
         scaled_y1 = int(y1 / self.view.canvas.winfo_height() * self.model.rotated_image.size[1])
         scaled_y2 = int(y2 / self.view.canvas.winfo_height() * self.model.rotated_image.size[1])
-        
-        # Calculate the number of lines (pixels) in the ROI
-        lines_averaged = scaled_y2 - scaled_y1
-        print(f" The number of vertical pixels in ROI is: {lines_averaged}")
-        
+        self.process_roi_rows(scaled_y1, scaled_y2)
+
+    def process_roi_rows(self, scaled_y1, scaled_y2):
         # Get the edge exclusion values from the view
         start_exclusion = int(self.view.start_exclusion_entry.get())
         end_exclusion = int(self.view.end_exclusion_entry.get())
     
-        roi_profile = np.mean(np.array(self.model.rotated_image)[scaled_y1:scaled_y2, start_exclusion:-end_exclusion], axis=0)
-        self.line_profile = roi_profile
+        # The running profile keeps the rows inside the image, use its rows from here on
+        self.running_profile = RunningRoiProfile(self.model.rotated_image)
+        self.running_profile.set_rows(scaled_y1, scaled_y2)
+        self.roi_rows = (self.running_profile.top, self.running_profile.bottom)
+        self.line_profile = self.running_profile.profile(start_exclusion, end_exclusion)
         
-        # Store the number of lines averaged
+        # Calculate and store the number of lines (pixels) in the ROI
+        lines_averaged = self.running_profile.bottom - self.running_profile.top
+        print(f" The number of vertical pixels in ROI is: {lines_averaged}")
         self.lines_averaged_in_ROI = lines_averaged
         
         self.plot_line_profile(self.line_profile)
-        
-        # sanity check:
-        import matplotlib.pyplot as plt
-        plt.imshow(self.model.rotated_image,cmap='gray')
-        plt.plot([start_exclusion, self.model.rotated_image.size[0]-end_exclusion], [scaled_y1, scaled_y1], color='green', linestyle='-', linewidth=1)  # Line at y1
-        plt.plot([start_exclusion, self.model.rotated_image.size[0]-end_exclusion], [scaled_y2, scaled_y2], color='red', linestyle='-', linewidth=1)  # Line at y2
-
 
-    def plot_line_profile(self, line_profile):
-        print("Entering plot_line_profile")
-        try:
-            print(f"Line profile length: {len(line_profile)}")
-            plt.figure()
-            # Convert pixel positions to micron positions if calibration factor is available
-            if self.calibration_factor:
-                x_axis = np.arange(len(line_profile)) * self.calibration_factor
-                plt.xlabel("Position (microns)")
-            else:
-                x_axis = np.arange(len(line_profile))
-                plt.xlabel("Pixel")
-            plt.plot(x_axis, line_profile)
-            plt.title("Line Profile")
-            plt.ylabel("Intensity")
-            plt.grid(True)  # Add grid
-            plt.show()
-            print("Plot displayed successfully")
-        except Exception as e:
-            print(f"Error during plotting: {e}")
-        finally:
-            print("Exiting plot_line_profile")
+    def plot_line_profile(self, line_profile, minima_indices=None):
+        # Convert pixel positions to micron positions if calibration factor is available
+        if self.calibration_factor:
+            x_axis = np.arange(len(line_profile)) * self.calibration_factor
+            xlabel = "Position (microns)"
+        else:
+            x_axis = np.arange(len(line_profile))
+            xlabel = "Pixel"
+        title = "Line Profile" if minima_indices is None else "Raw Line Profile with Minima"
+        self.view.plot_panel.update_profile(x_axis, line_profile, xlabel=xlabel, title=title, minima_indices=minima_indices)
 
     def analyze_poling(self):
         if self.line_profile is not None:
-            # Find the prominent minima in the line profile
-            minima_indices, _ = find_peaks(-self.line_profile, prominence=self.prominence_value)
-    
-            # Calculate the width of each region in pixels
-            region_widths_pixels = np.diff(minima_indices)
-    
-            # Convert region widths to microns using the calibration factor
-            if self.calibration_factor:
-                region_widths_microns = region_widths_pixels * self.calibration_factor
-            else:
-                region_widths_microns = region_widths_pixels  # If no calibration factor, keep it in pixels
-    
-            # Separate the widths into odd (actively poled) and even (passively poled) regions
-            odd_region_widths = region_widths_microns[::2]
-            even_region_widths = region_widths_microns[1::2]
-    
-            # Truncate to make sure odd and even regions have the same number of elements
-            min_length = min(len(odd_region_widths), len(even_region_widths))
-            odd_region_widths = odd_region_widths[:min_length]
-            even_region_widths = even_region_widths[:min_length]
-    
-            # Calculate the mean and standard deviation of the region widths
-            odd_mean = np.mean(odd_region_widths)
-            odd_std = np.std(odd_region_widths)
-            even_mean = np.mean(even_region_widths)
-            even_std = np.std(even_region_widths)
-    
-            # Plot the line profile with minima marked
-            self.line_profile_fig = plt.figure()
-            x = np.arange(len(self.line_profile))
-            if self.calibration_factor:
-                x_axis = x * self.calibration_factor
-                plt.xlabel("Position (Microns)")
-            else:
-                x_axis = x
-                plt.xlabel("Pixel")
-            plt.plot(x_axis, self.line_profile, label="Raw Line Profile")
-            plt.plot(x_axis[minima_indices], self.line_profile[minima_indices], 'rx', label="Minima")
-            plt.title("Raw Line Profile with Minima")
-            plt.ylabel("Intensity")
-            plt.legend()
-            plt.grid(True)
-            plt.show()
-    
-            # Plot the widths of odd and even regions
-            self.widths_fig = plt.figure()  # Store the figure reference
-            plt.plot(np.arange(1, len(odd_region_widths) + 1), odd_region_widths, 'ro-', 
-                     label=r"Actively Poled (Odd) Regions" "\n" r"$\mathbf{Mean:}$ " f"{odd_mean:.2f} µm, " r"$\mathbf{Std:}$ " f"{odd_std:.2f} µm")
-            plt.plot(np.arange(1, len(even_region_widths) + 1), even_region_widths, 'bo-', 
-                     label=r"Passively Poled (Even) Regions" "\n" r"$\mathbf{Mean:}$ " f"{even_mean:.2f} µm, " r"$\mathbf{Std:}$ " f"{even_std:.2f} µm")
-            plt.axhline(y=odd_mean, color='black', linestyle='--')
-            plt.axhline(y=even_mean, color='black', linestyle='--')
-            plt.title("Region Widths")
-            plt.xlabel("Region Number")
-            plt.ylabel("Width (Microns)" if self.calibration_factor else "Width (Pixels)")
-            plt.grid(True)
-            plt.legend()
-            plt.show()
-    
-            # Redefine duty cycle as odd_region_width / (odd_region_width + even_region_width)
-            duty_cycle = odd_region_widths / (odd_region_widths + even_region_widths)
-    
-            # Calculate the mean and standard deviation of the duty cycle
-            duty_cycle_mean = np.mean(duty_cycle)
-            duty_cycle_std = np.std(duty_cycle)
-    
-            # Plot the duty cycle
-            self.duty_cycle_fig = plt.figure()  # Store the figure reference
-            plt.plot(np.arange(1, len(duty_cycle) + 1), duty_cycle, 'mo-',  # Change to purple
-                     label=r"$\mathbf{Duty\ Cycle}$" "\n" r"$\mathbf{Mean:}$ " f"{duty_cycle_mean:.2f}, " r"$\mathbf{Std:}$ " f"{duty_cycle_std:.2f}")
-            plt.axhline(y=duty_cycle_mean, color='black', linestyle='--')
-            plt.axhline(y=0.5, color='red', linestyle='--')  # Add a red dashed line at 0.5
-            plt.ylim(0, 1)
-            plt.title("Duty Cycle")
-            plt.xlabel("Region Pair Number")
-            plt.ylabel("Duty Cycle (Odd / (Odd + Even))")
-            plt.grid(True)
-            plt.legend()
-            plt.show()
-    
-            # Store calculated quantities for future use
-            self.analysis_results = {
-                "odd_region_widths": odd_region_widths,
-                "even_region_widths": even_region_widths,
-                "odd_mean": odd_mean,
-                "odd_std": odd_std,
-                "even_mean": even_mean,
-                "even_std": even_std,
-                "duty_cycle": duty_cycle,
-                "duty_cycle_mean": duty_cycle_mean,
-                "duty_cycle_std": duty_cycle_std,
-                "lines_averaged": self.lines_averaged_in_ROI
-            }
+            try:
+                self.run_analysis()
+            except ValueError as e:
+                print(f"Error analyzing poling: {e}")
+                return
+            print(f"Poling analyzed with the {self.view.engine_var.get()} engine")
         else:
             print("No line profile available for analysis.")
+
+    def run_analysis(self):
+        # Run the selected analysis engine (all engines return the same results schema)
+        engine = self.view.engine_var.get()
+        self.analysis_results = analysis.run_engine(engine, self.line_profile, self.calibration_factor, self.prominence_value)
+        self.analysis_results["lines_averaged"] = self.lines_averaged_in_ROI
+
+        # Refresh the embedded plot panel in place
+        self.plot_line_profile(self.line_profile, self.analysis_results["minima_indices"])
+        self.view.plot_panel.update_results(self.analysis_results, bool(self.calibration_factor))
+
+    def drag_roi_handle(self, handle, x, y):
+        if self.roi_rows is None or self.model.rotated_image is None:
+            return
+        image_width, image_height = self.model.rotated_image.size
+        canvas_width = self.view.canvas.winfo_width()
+        canvas_height = self.view.canvas.winfo_height()
+        top, bottom = self.roi_rows
+        if handle == "roi_top":
+            top = int(np.clip(y / canvas_height * image_height, 0, bottom - 1))
+        elif handle == "roi_bottom":
+            bottom = int(np.clip(y / canvas_height * image_height, top + 1, image_height))
+        else:
+            try:
+                start_exclusion = int(self.view.start_exclusion_entry.get())
+                end_exclusion = int(self.view.end_exclusion_entry.get())
+            except ValueError:
+                return
+            column = int(np.clip(x / canvas_width * image_width, 0, image_width))
+            if handle == "exclusion_start":
+                start_exclusion = min(column, image_width - end_exclusion - analysis.MIN_PROFILE_LENGTH)
+            else:
+                end_exclusion = min(image_width - column, image_width - start_exclusion - analysis.MIN_PROFILE_LENGTH)
+            self.view.set_edge_exclusion(max(start_exclusion, 0), max(end_exclusion, 0))
+        self.roi_rows = (top, bottom)
+        self.view.update_profile_lines(top / image_height * canvas_height, bottom / image_height * canvas_height)
+        self.schedule_live_update()
+
+    def schedule_live_update(self):
+        # Coalesce drag events: at most one re-analysis per pass of the event loop
+        if self.roi_rows is not None and not self._live_update_pending:
+            self._live_update_pending = True
+            self.view.root.after_idle(self.live_update)
+
+    def live_update(self):
+        self._live_update_pending = False
+        try:
+            start_exclusion = int(self.view.start_exclusion_entry.get())
+            end_exclusion = int(self.view.end_exclusion_entry.get())
+        except ValueError:
+            return
+        # The sums are rebuilt only when the image itself changed (new image or rotation)
+        if self.running_profile is None or self.running_profile.source is not self.model.rotated_image:
+            self.running_profile = RunningRoiProfile(self.model.rotated_image)
+        self.running_profile.set_rows(*self.roi_rows)
+        line_profile = self.running_profile.profile(start_exclusion, end_exclusion)
+        if len(line_profile) < analysis.MIN_PROFILE_LENGTH:
+            return
+        self.line_profile = line_profile
+        self.lines_averaged_in_ROI = self.running_profile.bottom - self.running_profile.top
+        self.run_analysis()
     
 
+    def compare_engines(self):
+        if self.line_profile is None:
+            print("No line profile available for analysis.")
+            return
+        try:
+            comparison = analysis.compare_engines(self.line_profile, self.calibration_factor, self.prominence_value)
+        except ValueError as e:
+            print(f"Error comparing engines: {e}")
+            return
+        unit = "µm" if self.calibration_factor else "px"
+        lines = []
+        for name, (results, seconds) in comparison.items():
+            lines.append(f"{name} engine ({seconds * 1000:.2f} ms):\n"
+                         f"  Odd width: {results['odd_mean']:.3f} ± {results['odd_std']:.3f} {unit}\n"
+                         f"  Even width: {results['even_mean']:.3f} ± {results['even_std']:.3f} {unit}\n"
+                         f"  Duty cycle: {results['duty_cycle_mean']:.3f} ± {results['duty_cycle_std']:.3f}")
+        report = "\n\n".join(lines)
+        print(report)
+        messagebox.showinfo("Engine Comparison", report)
+
     def choose_calibration_region(self):
         self.calibration_region = []
         self.view.bind_canvas_click(self.define_calibration_region)
@@ -306,20 +300,15 @@ class ImageController:
         self.calculate_calibration_factor(calibration_data)
 
     def plot_calibration_data(self, calibration_data):
+        from scipy.signal import find_peaks
         min_value = np.min(calibration_data)
         minima_indices, properties = find_peaks(-calibration_data, prominence=self.prominence_value)
 
-        plt.figure()
-        plt.plot(calibration_data, label="Calibration Profile")
-        plt.plot(minima_indices, calibration_data[minima_indices], 'rx', label="Minima")
-        plt.title("Calibration Region Profile")
-        plt.xlabel("Pixel")
-        plt.ylabel("Intensity")
-        plt.grid(True)  # Add grid
-        plt.legend()
-        plt.show()
+        self.view.plot_panel.update_profile(np.arange(len(calibration_data)), calibration_data,
+                                            title="Calibration Region Profile", minima_indices=minima_indices)
 
     def calculate_calibration_factor(self, calibration_data):
+        from scipy.signal import find_peaks
         nominal_period = float(self.view.nominal_period_entry.get())
         minima_indices, properties = find_peaks(-calibration_data, prominence=self.prominence_value)
         num_periods = len(minima_indices) - 1
@@ -336,9 +325,7 @@ class ImageController:
 
     def save_results(self):
         # Paths for the plots and analysis data
-        widths_plot_path = os.path.join(self.image_dir, f"{os.path.splitext(self.image_file_name)[0]}_widths.png")
-        duty_cycle_plot_path = os.path.join(self.image_dir, f"{os.path.splitext(self.image_file_name)[0]}_duty_cycle.png")
-        analysis_data_path = os.path.join(self.image_dir, f"{os.path.splitext(self.image_file_name)[0]}_analysis_data.csv")
+        widths_plot_path, duty_cycle_plot_path, analysis_data_path = results_io.output_paths(self.image_dir, self.image_file_name)
         
         # Check if files already exist for the current image
         if os.path.exists(widths_plot_path) or os.path.exists(duty_cycle_plot_path) or os.path.exists(analysis_data_path):
@@ -346,78 +333,105 @@ class ImageController:
             if not overwrite:
                 return  # If user chooses not to overwrite, return early
         
-        # Extract data from text boxes (excluding Description for now)
-        data = {label: entry.get() for label, entry in self.view.text_entries.items() if label != "Description"}
-        
-        # Add additional data
-        data["Rotation Angle"] = self.rotation_angle
-        data["Image File Name"] = self.image_file_name
-        data["Analysis Date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # Add analysis date
-        
-        # Extract analysis results
-        if self.analysis_results:
-            data.update({
-                "Mean Odd Region Width (µm)": self.analysis_results["odd_mean"],
-                "Std Odd Region Width (µm)": self.analysis_results["odd_std"],
-                "Mean Even Region Width (µm)": self.analysis_results["even_mean"],
-                "Std Even Region Width (µm)": self.analysis_results["even_std"],
-                "Mean Duty Cycle": self.analysis_results["duty_cycle_mean"],
-                "Std Duty Cycle": self.analysis_results["duty_cycle_std"],
-                "Lines Averaged in ROI": self.analysis_results["lines_averaged"]
-            })
-        else:
+        if not self.analysis_results:
             print("No analysis results to save.")
             return
         
-        # Add the Description field last
-        data["Description"] = self.view.text_entries["Description"].get()
-        
-        # Write the detailed analysis data (region widths and duty cycle) to a CSV file in the image directory
-        with open(analysis_data_path, 'w', newline='') as csvfile:
-            fieldnames = ["Region Number", "Odd Region Width (µm)", "Even Region Width (µm)", "Duty Cycle"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for i in range(len(self.analysis_results["odd_region_widths"])):
-                writer.writerow({
-                    "Region Number": i + 1,
-                    "Odd Region Width (µm)": self.analysis_results["odd_region_widths"][i],
-                    "Even Region Width (µm)": self.analysis_results["even_region_widths"][i],
-                    "Duty Cycle": self.analysis_results["duty_cycle"][i]
-                })
-            # Write the summary stats at the end of the CSV
-            writer.writerow({})
-            writer.writerow({"Region Number": "Mean Odd Region Width (µm)", "Odd Region Width (µm)": self.analysis_results["odd_mean"]})
-            writer.writerow({"Region Number": "Std Odd Region Width (µm)", "Odd Region Width (µm)": self.analysis_results["odd_std"]})
-            writer.writerow({"Region Number": "Mean Even Region Width (µm)", "Even Region Width (µm)": self.analysis_results["even_mean"]})
-            writer.writerow({"Region Number": "Std Even Region Width (µm)", "Even Region Width (µm)": self.analysis_results["even_std"]})
-            writer.writerow({"Region Number": "Mean Duty Cycle", "Duty Cycle": self.analysis_results["duty_cycle_mean"]})
-            writer.writerow({"Region Number": "Std Duty Cycle", "Duty Cycle": self.analysis_results["duty_cycle_std"]})
-        print(f"Analysis data saved to {analysis_data_path}")
-        
-        # Save the already plotted figures
-        self.widths_fig.savefig(widths_plot_path)
-        print(f"Widths plot saved to {widths_plot_path}")
-        
-        self.duty_cycle_fig.savefig(duty_cycle_plot_path)
-        print(f"Duty cycle plot saved to {duty_cycle_plot_path}")
-        
-        # Write to the main CSV database
-        if not os.path.exists(self.csv_file):
-            write_header = True  # File doesn't exist, so write the header
-            mode = 'w'  # Create the file
-        else:
-            write_header = False  # File exists, no need to write header
-            mode = 'a'  # Open in append mode
-        
-        with open(self.csv_file, mode, newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=data.keys())
-            if write_header:
-                writer.writeheader()
-            writer.writerow(data)
+        # Info fields from the text boxes, the Description goes last
+        metadata = {label: entry.get() for label, entry in self.view.text_entries.items() if label != "Description"}
+        description = self.view.text_entries["Description"].get()
+        data = results_io.database_row(metadata, self.rotation_angle, self.image_file_name, self.analysis_results, description)
         
-        print("Results saved to", self.csv_file)
+        results_io.write_analysis_data(analysis_data_path, self.analysis_results, bool(self.calibration_factor))
+        results_io.write_figures(widths_plot_path, duty_cycle_plot_path, self.analysis_results, bool(self.calibration_factor))
+        results_io.append_to_database(self.csv_file, data)
+
+    def show_trends(self):
+        # Statistics are kept up to date on every save, so this does not rescan the database
+        self.view.show_trend_dashboard(aggregates.AggregateStore(self.csv_file))
+
+    def current_recipe(self):
+        from recipe import Recipe
+        metadata = {label: entry.get() for label, entry in self.view.text_entries.items() if label != "Description"}
+        return Recipe(
+            rotation_angle=self.rotation_angle,
+            roi_rows=self.roi_rows,
+            start_exclusion=self.view.start_exclusion_entry.get(),
+            end_exclusion=self.view.end_exclusion_entry.get(),
+            prominence=self.prominence_value,
+            calibration_factor=self.calibration_factor,
+            engine=self.view.engine_var.get(),
+            reference_image=self.image_path,
+            metadata=metadata,
+        )
+
+    def save_recipe(self):
+        if self.image_path is None or self.roi_rows is None:
+            messagebox.showwarning("Save Recipe", "Load an image and select a poling ROI first.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".ini", filetypes=[("Recipe files", "*.ini"), ("All files", "*.*")])
+        if file_path:
+            self.current_recipe().save(file_path)
+
+    def apply_recipe(self):
+        if self.model.image is None:
+            messagebox.showwarning("Apply Recipe", "Load an image first.")
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("Recipe files", "*.ini"), ("All files", "*.*")])
+        if not file_path:
+            return
+        from recipe import Recipe
+        try:
+            recipe = Recipe.load(file_path)
+        except ValueError as error:
+            messagebox.showerror("Apply Recipe", str(error))
+            return
+        rotation_angle, (y1, y2) = recipe.register(self.model.image)
+
+        # Push the recipe settings into the GUI
+        for entry, value in ((self.view.start_exclusion_entry, recipe.start_exclusion), (self.view.end_exclusion_entry, recipe.end_exclusion)):
+            entry.delete(0, "end")
+            entry.insert(0, str(value))
+        for label, value in recipe.metadata.items():
+            if label in self.view.text_entries:
+                self.view.text_entries[label].delete(0, "end")
+                self.view.text_entries[label].insert(0, value)
+        self.prominence_value = recipe.prominence
+        self.calibration_factor = recipe.calibration_factor
+        self.view.calibration_factor_value.set(f"{recipe.calibration_factor:.6f}" if recipe.calibration_factor else "N/A")
+        self.view.engine_var.set(recipe.engine)
+
+        # Rotate, draw the registered ROI and analyze
+        self.rotate_image(rotation_angle)
+        self.view.rotation_slider.set(rotation_angle)  # Display only, see rotation_slider_moved
+        self.process_roi_rows(y1, y2)
+        y1, y2 = self.roi_rows  # Kept inside the image
+        image_height = self.model.rotated_image.size[1]
+        canvas_height = self.view.canvas.winfo_height()
+        self.view.update_profile_lines(y1 / image_height * canvas_height, y2 / image_height * canvas_height)
+        self.analyze_poling()
+
+    def run_recipe_on_directory(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Recipe files", "*.ini"), ("All files", "*.*")])
+        if not file_path:
+            return
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+        import batch
+        from recipe import Recipe
+        try:
+            recipe = Recipe.load(file_path)
+        except ValueError as error:
+            messagebox.showerror("Batch Analysis", str(error))
+            return
+        processed = batch.run_directory(recipe, directory, self.csv_file)
+        messagebox.showinfo("Batch Analysis", f"{len(processed)} image(s) analyzed and saved to {self.csv_file}\n"
+                                              f"Report: {os.path.join(directory, 'report', 'index.html')}")
  
     def auto_rotate_image(self):
+        from skimage import color, feature, transform
+        
         # Convert the original image to a NumPy array
         image_array = np.array(self.model.rotated_image)
         
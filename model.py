@@ -6,7 +6,6 @@ Created on Tue Aug  6 13:47:50 2024
 """
 from PIL import Image, ImageOps
 import numpy as np
-from scipy.ndimage import rotate
 
 class ImageModel:
     def __init__(self):
@@ -27,6 +26,7 @@ class ImageModel:
     def rotate_image(self, angle):
         self.rotation_angle = float(angle)
         if self.image:
+            from scipy.ndimage import rotate  # Imported on first use to keep startup fast
             rotated_image = ImageOps.exif_transpose(self.image)
             rotated_image = Image.fromarray(rotate(np.array(rotated_image), self.rotation_angle, reshape=False))
             self.rotated_image = rotated_image  # Update the rotated image
@@ -40,3 +40,51 @@ class ImageModel:
             print(f"Extracted line profile at y={y}: {line_profile}")  # Debug statement
             return line_profile
         return None
+
+    def get_roi_profile(self, y1, y2, start_exclusion, end_exclusion):
+        # Vertically averaged profile of rows y1:y2, without the excluded edge pixels
+        if self.rotated_image:
+            image_array = np.array(self.rotated_image)
+            height, width = image_array.shape[:2]
+            y1, y2 = max(y1, 0), min(y2, height)  # A negative y1 would slice from the bottom
+            return np.mean(image_array[y1:y2, start_exclusion:width - end_exclusion], axis=0)
+        return None
+
+
+class RunningRoiProfile:
+    """Column sums of the ROI rows of an image, kept up to date incrementally.
+
+    Moving the ROI only adds the rows that enter it and subtracts the rows that
+    leave it, instead of averaging the whole slice again. The sums cover the
+    full image width, so changing the edge exclusions costs nothing.
+    """
+
+    def __init__(self, image):
+        self.source = image  # The (rotated) PIL image the sums were taken from
+        self.data = np.asarray(image, dtype=np.float64)
+        self.top = 0
+        self.bottom = 0
+        self.sum = np.zeros(self.data.shape[1:])
+
+    def set_rows(self, top, bottom):
+        top, bottom = sorted((int(top), int(bottom)))
+        top = min(max(top, 0), self.data.shape[0])
+        bottom = min(max(bottom, 0), self.data.shape[0])
+        if top >= self.bottom or bottom <= self.top:
+            # No overlap with the previous ROI, start over
+            self.sum = self.data[top:bottom].sum(axis=0)
+        else:
+            if top < self.top:
+                self.sum += self.data[top:self.top].sum(axis=0)
+            elif top > self.top:
+                self.sum -= self.data[self.top:top].sum(axis=0)
+            if bottom > self.bottom:
+                self.sum += self.data[self.bottom:bottom].sum(axis=0)
+            elif bottom < self.bottom:
+                self.sum -= self.data[bottom:self.bottom].sum(axis=0)
+        self.top, self.bottom = top, bottom
+
+    def profile(self, start_exclusion, end_exclusion):
+        # Mean of the ROI rows, without the excluded edge pixels
+        width = self.data.shape[1]
+        return self.sum[start_exclusion:width - end_exclusion] / max(self.bottom - self.top, 1)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Standalone figures of the poling analysis results, used when exporting.
+
+These figures are built on matplotlib.figure.Figure directly rather than
+through pyplot, so they are never registered with the pyplot figure manager
+and are freed as soon as they go out of scope.
+"""
+import numpy as np
+
+
+def widths_figure(results, calibrated):
+    odd_region_widths = results["odd_region_widths"]
+    even_region_widths = results["even_region_widths"]
+    odd_mean = results["odd_mean"]
+    odd_std = results["odd_std"]
+    even_mean = results["even_mean"]
+    even_std = results["even_std"]
+
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.add_subplot(111)
+    ax.plot(np.arange(1, len(odd_region_widths) + 1), odd_region_widths, 'ro-',
+            label=r"Actively Poled (Odd) Regions" "\n" r"$\mathbf{Mean:}$ " f"{odd_mean:.2f} µm, " r"$\mathbf{Std:}$ " f"{odd_std:.2f} µm")
+    ax.plot(np.arange(1, len(even_region_widths) + 1), even_region_widths, 'bo-',
+            label=r"Passively Poled (Even) Regions" "\n" r"$\mathbf{Mean:}$ " f"{even_mean:.2f} µm, " r"$\mathbf{Std:}$ " f"{even_std:.2f} µm")
+    ax.axhline(y=odd_mean, color='black', linestyle='--')
+    ax.axhline(y=even_mean, color='black', linestyle='--')
+    ax.set_title("Region Widths")
+    ax.set_xlabel("Region Number")
+    ax.set_ylabel("Width (Microns)" if calibrated else "Width (Pixels)")
+    ax.grid(True)
+    ax.legend()
+    return fig
+
+
+def duty_cycle_figure(results):
+    duty_cycle = results["duty_cycle"]
+    duty_cycle_mean = results["duty_cycle_mean"]
+    duty_cycle_std = results["duty_cycle_std"]
+
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.add_subplot(111)
+    ax.plot(np.arange(1, len(duty_cycle) + 1), duty_cycle, 'mo-',
+            label=r"$\mathbf{Duty\ Cycle}$" "\n" r"$\mathbf{Mean:}$ " f"{duty_cycle_mean:.2f}, " r"$\mathbf{Std:}$ " f"{duty_cycle_std:.2f}")
+    ax.axhline(y=duty_cycle_mean, color='black', linestyle='--')
+    ax.axhline(y=0.5, color='red', linestyle='--')  # Nominal 50% duty cycle
+    ax.set_ylim(0, 1)
+    ax.set_title("Duty Cycle")
+    ax.set_xlabel("Region Pair Number")
+    ax.set_ylabel("Duty Cycle (Odd / (Odd + Even))")
+    ax.grid(True)
+    ax.legend()
+    return fig
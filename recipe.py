@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Analysis recipes: everything needed to repeat an analysis on another image of
+the same chip layout (rotation, ROI rows, edge exclusions, prominence,
+calibration, engine and the info fields), stored as an .ini file.
+
+When a recipe is applied to a new image, the image is registered against the
+reference image the recipe was authored on by phase correlation of the
+column-averaged profiles of a few vertical strips. The poling grating averages
+out along each strip, leaving the chip layout. The mean shift moves the ROI
+rows and the change of shift across the strips refines the rotation angle.
+
+Neither image is resampled: the strip profiles are taken from narrow column
+groups of the unrotated image, each moved along by the known recipe rotation.
+The reference strip profiles are saved in the recipe itself, so it still
+registers images after the reference image has been moved or deleted.
+"""
+import numpy as np
+from PIL import Image, ImageOps
+
+
+def grayscale_array(image):
+    # Single-channel images are kept in their own dtype, strip_profiles sums them as floats
+    image_array = np.asarray(ImageOps.exif_transpose(image))
+    if image_array.ndim == 3:
+        from skimage import color
+        image_array = color.rgb2gray(image_array[..., :3])
+    return image_array
+
+
+def phase_correlation_shift(reference, moving):
+    # Subpixel shift that registers the 1D profile `moving` onto `reference`
+    window = np.hanning(len(reference))
+    cross_power = np.fft.fft((reference - reference.mean()) * window) * np.conj(np.fft.fft((moving - moving.mean()) * window))
+    correlation = np.real(np.fft.ifft(cross_power / (np.abs(cross_power) + 1e-12)))
+    peak = int(np.argmax(correlation))
+    left, centre, right = correlation[peak - 1], correlation[peak], correlation[(peak + 1) % len(correlation)]
+    denominator = left - 2 * centre + right
+    delta = 0.5 * (left - right) / denominator if denominator != 0 else 0
+    shift = peak + delta
+    return shift - len(correlation) if shift > len(correlation) / 2 else shift
+
+
+def format_values(values):
+    return " ".join(f"{value:.6g}" for value in values)
+
+
+def parse_values(text):
+    return np.array([float(value) for value in text.split()])
+
+
+def strip_profiles(image_array, rotation_angle, n_strips, group_width=16):
+    """Column-averaged profiles of `n_strips` vertical strips of the image as
+    it looks after scipy.ndimage.rotate(image_array, rotation_angle).
+
+    The columns are averaged in groups of `group_width`, and the profile of
+    each group is resampled at the rows that the rotation about the image
+    centre brings to it. Returns the profiles and the strip centres relative
+    to the image centre.
+    """
+    height, width = image_array.shape
+    groups = max(width // group_width, n_strips)
+    group_width = width // groups
+    columns = image_array[:, :groups * group_width].reshape(height, groups, group_width).sum(axis=2, dtype=float).T / group_width
+
+    theta = np.radians(rotation_angle)
+    rows = np.arange(height)
+    centre_x, centre_y = (width - 1) / 2, (height - 1) / 2
+    x = (np.arange(groups) + 0.5) * group_width - 0.5 - centre_x
+    source = np.clip(centre_y + x[:, None] * np.sin(theta) + (rows - centre_y) * np.cos(theta), 0, height - 1)
+    lower = np.minimum(source.astype(int), height - 2)
+    weight = source - lower
+    rotated = (np.take_along_axis(columns, lower, axis=1) * (1 - weight)
+               + np.take_along_axis(columns, lower + 1, axis=1) * weight)
+
+    edges = np.linspace(0, groups, n_strips + 1).astype(int)
+    profiles = np.array([rotated[lo:hi].mean(axis=0) for lo, hi in zip(edges[:-1], edges[1:])])
+    centres = np.array([x[lo:hi].mean() for lo, hi in zip(edges[:-1], edges[1:])])
+    return profiles, centres
+
+
+class Recipe:
+    N_STRIPS = 4
+
+    def __init__(self, rotation_angle=0.0, roi_rows=(0, 0), start_exclusion=20, end_exclusion=20,
+                 prominence=10, calibration_factor=None, engine="Minima", reference_image=None, metadata=None):
+        self.rotation_angle = float(rotation_angle)
+        self.roi_rows = tuple(int(row) for row in roi_rows)  # (top, bottom) rows of the rotated image
+        self.start_exclusion = int(start_exclusion)
+        self.end_exclusion = int(end_exclusion)
+        self.prominence = float(prominence)
+        self.calibration_factor = calibration_factor
+        self.engine = engine
+        self.reference_image = reference_image  # Path of the image the recipe was authored on
+        self.metadata = dict(metadata or {})  # Info text fields (RUN#, Chip#, ...)
+        self._reference = None  # Grayscale reference, loaded on first registration
+        self._reference_profiles = {}  # Reference strip profiles by (height, width, n_strips)
+        self.reference_size = None  # (height, width) of the reference image
+
+    def save(self, file_path):
+        import configparser
+        config = configparser.ConfigParser()
+        config.optionxform = str  # Keep the case of the info field labels
+        config["Recipe"] = {
+            "rotation_angle": str(self.rotation_angle),
+            "roi_top": str(self.roi_rows[0]),
+            "roi_bottom": str(self.roi_rows[1]),
+            "start_exclusion": str(self.start_exclusion),
+            "end_exclusion": str(self.end_exclusion),
+            "prominence": str(self.prominence),
+            "calibration_factor": "" if self.calibration_factor is None else str(self.calibration_factor),
+            "engine": self.engine,
+            "reference_image": self.reference_image or "",
+        }
+        config["Metadata"] = self.metadata
+        reference = self.saved_reference()
+        if reference is not None:
+            profiles, centres = reference
+            config["Reference"] = {
+                "height": str(self.reference_size[0]),
+                "width": str(self.reference_size[1]),
+                "centres": format_values(centres),
+                **{f"profile_{i}": format_values(profile) for i, profile in enumerate(profiles)},
+            }
+        with open(file_path, 'w') as recipe_file:
+            config.write(recipe_file)
+        print(f"Recipe saved to {file_path}")
+
+    @classmethod
+    def load(cls, file_path):
+        import configparser
+        config = configparser.ConfigParser()
+        config.optionxform = str
+        config.read(file_path)
+        if "Recipe" not in config:
+            raise ValueError(f"{file_path} is not a recipe file (no [Recipe] section)")
+        section = config["Recipe"]
+        calibration_factor = section.get("calibration_factor", "")
+        recipe = cls(
+            rotation_angle=section.getfloat("rotation_angle", 0.0),
+            roi_rows=(section.getint("roi_top"), section.getint("roi_bottom")),
+            start_exclusion=section.getint("start_exclusion", 20),
+            end_exclusion=section.getint("end_exclusion", 20),
+            prominence=section.getfloat("prominence", 10),
+            calibration_factor=float(calibration_factor) if calibration_factor else None,
+            engine=section.get("engine", "Minima"),
+            reference_image=section.get("reference_image", "") or None,
+            metadata=dict(config["Metadata"]) if "Metadata" in config else {},
+        )
+        if "Reference" in config:
+            section = config["Reference"]
+            recipe.reference_size = (section.getint("height"), section.getint("width"))
+            centres = parse_values(section["centres"])
+            profiles = np.array([parse_values(section[f"profile_{i}"]) for i in range(len(centres))])
+            recipe._reference_profiles[recipe.reference_size + (len(centres),)] = (profiles, centres)
+        return recipe
+
+    def reference(self):
+        if self._reference is None:
+            if not self.reference_image:
+                raise FileNotFoundError("the recipe has no reference image")
+            self._reference = grayscale_array(Image.open(self.reference_image))
+            self.reference_size = self._reference.shape
+        return self._reference
+
+    def saved_reference(self):
+        # Strip profiles of the whole reference image, None if there is none to read
+        if not self.reference_image and self.reference_size is None:
+            return None
+        try:
+            height, width = self.reference_size or self.reference().shape
+            return self.reference_profiles(height, width, self.N_STRIPS)
+        except OSError as error:
+            print(f"Warning: reference image not saved in the recipe: {error}")
+            return None
+
+    def reference_profiles(self, height, width, n_strips):
+        key = (height, width, n_strips)
+        if key not in self._reference_profiles:
+            self._reference_profiles[key] = strip_profiles(self.reference()[:height, :width], self.rotation_angle, n_strips)
+        return self._reference_profiles[key]
+
+    def register(self, image, n_strips=N_STRIPS, passes=2):
+        """Return (rotation_angle, roi_rows) adjusted to `image`.
+
+        Without a reference the recipe values are returned unchanged.
+        """
+        if not self.reference_image and self.reference_size is None:
+            return self.rotation_angle, self.roi_rows
+
+        moving = grayscale_array(image)
+
+        # Compare the overlapping part only, in case the image sizes differ slightly.
+        # The saved profiles cover the whole reference, other sizes need the image.
+        try:
+            reference_height, reference_width = self.reference_size or self.reference().shape
+            height = min(reference_height, moving.shape[0])
+            width = min(reference_width, moving.shape[1])
+            reference_profiles, centres = self.reference_profiles(height, width, n_strips)
+        except OSError as error:
+            print(f"Warning: cannot register against the reference ({error}), using the recipe rotation and ROI as saved")
+            return self.rotation_angle, self.roi_rows
+
+        # Vertical shift of each strip, then a straight line through them:
+        # the slope is the residual tilt, the value at the centre the translation.
+        # A large tilt smears the strip profiles and is underestimated, so the
+        # image is registered again at the corrected angle.
+        rotation_angle = self.rotation_angle
+        for _ in range(passes):
+            moving_profiles, _ = strip_profiles(moving[:height, :width], rotation_angle, n_strips)
+            shifts = [phase_correlation_shift(reference_profile, moving_profile)
+                      for reference_profile, moving_profile in zip(reference_profiles, moving_profiles)]
+            slope, shift = np.polyfit(centres, shifts, 1)
+            rotation_angle -= np.degrees(np.arctan(slope))
+
+        angle_correction = rotation_angle - self.rotation_angle
+        top, bottom = self.roi_rows
+        roi_rows = (int(round(top - shift)), int(round(bottom - shift)))
+        print(f"Registered: shift {shift:.2f} rows, angle correction {angle_correction:.3f} degrees")
+        return rotation_angle, roi_rows
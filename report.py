@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Run-level report for a directory of analyzed images.
+
+For every <image>_analysis_data.csv in the directory the widths and duty cycle
+plots and a thumbnail of the image are rendered with Agg in a process pool.
+An HTML report with an index table and the run's aggregate histograms is then
+written to <directory>/report/index.html. A manifest records a hash of each
+image's analysis data, so plots whose results did not change are not rendered
+again. The units of each image's widths are read from its analysis data.
+
+Usage:
+    python report.py path/to/images [--processes N]
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import results_io
+
+DATA_SUFFIX = "_analysis_data.csv"
+THUMBNAIL_SIZE = (160, 120)
+SUMMARY_KEYS = {
+    "Mean Odd Region Width": "odd_mean",
+    "Std Odd Region Width": "odd_std",
+    "Mean Even Region Width": "even_mean",
+    "Std Even Region Width": "even_std",
+    "Mean Duty Cycle": "duty_cycle_mean",
+    "Std Duty Cycle": "duty_cycle_std",
+}
+
+
+def load_analysis_data(analysis_data_path):
+    # Read back what results_io.write_analysis_data wrote: one row per region, then the summary rows.
+    # Files written before the Units row was added are taken as calibrated, as their header says.
+    odd, even, duty_cycle = [], [], []
+    results = {"calibrated": True}
+    with open(analysis_data_path, newline='', errors='replace') as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)  # Header
+        for row in reader:
+            if not row or not row[0]:
+                continue
+            if row[0].isdigit():
+                odd.append(float(row[1]))
+                even.append(float(row[2]))
+                duty_cycle.append(float(row[3]))
+                continue
+            if row[0] == "Units":
+                results["calibrated"] = row[1] != "pixels"
+                continue
+            key = SUMMARY_KEYS.get(row[0].split(" (")[0])
+            if key:
+                results[key] = float(next(value for value in row[1:] if value))
+    results.update({
+        "odd_region_widths": np.array(odd),
+        "even_region_widths": np.array(even),
+        "duty_cycle": np.array(duty_cycle),
+    })
+    return results
+
+
+def file_hash(path):
+    with open(path, 'rb') as data_file:
+        return hashlib.sha1(data_file.read()).hexdigest()
+
+
+def find_image(directory, base_name):
+    # The analysis data is saved next to the image, whatever its extension
+    for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(base_name) + ".*")):
+        if not path.endswith((".csv", ".png")):
+            return path
+    return None
+
+
+def render_job(job):
+    # Runs in a worker process: figures and thumbnail of one image
+    results = load_analysis_data(job["analysis_data_path"])
+    results_io.write_figures(job["widths_plot_path"], job["duty_cycle_plot_path"], results, results["calibrated"])
+    if job["image_path"]:
+        from PIL import Image
+        with Image.open(job["image_path"]) as image:
+            image_array = np.asarray(image)
+            if image_array.dtype != np.uint8:
+                # convert("L") would saturate 16-bit and float images: stretch their own range instead
+                low, high = np.percentile(image_array, (0.5, 99.5))
+                image = Image.fromarray(np.clip((image_array - low) / max(high - low, 1e-12) * 255, 0, 255).astype(np.uint8))
+            image.thumbnail(THUMBNAIL_SIZE)
+            image.convert("L").save(job["thumbnail_path"])
+    return job["name"]
+
+
+def render_histograms(entries, histogram_path):
+    from matplotlib.figure import Figure
+
+    units = " or ".join(sorted({"µm" if entry["results"]["calibrated"] else "pixels" for entry in entries}))  # A run may mix both
+    duty_cycle_means = [entry["results"]["duty_cycle_mean"] for entry in entries]
+    duty_cycles = np.concatenate([entry["results"]["duty_cycle"] for entry in entries] or [[]])
+    odd_widths = np.concatenate([entry["results"]["odd_region_widths"] for entry in entries] or [[]])
+    even_widths = np.concatenate([entry["results"]["even_region_widths"] for entry in entries] or [[]])
+
+    fig = Figure(figsize=(12, 4))
+    mean_ax, regions_ax, widths_ax = fig.subplots(1, 3)
+    mean_ax.hist(duty_cycle_means, bins=20, range=(0, 1), color='m', edgecolor='black')
+    mean_ax.set_title("Mean Duty Cycle per Image")
+    mean_ax.set_xlabel("Duty Cycle")
+    mean_ax.set_ylabel("Images")
+    regions_ax.hist(duty_cycles, bins=40, range=(0, 1), color='m', edgecolor='black')
+    regions_ax.set_title("Duty Cycle of All Region Pairs")
+    regions_ax.set_xlabel("Duty Cycle")
+    regions_ax.set_ylabel("Region Pairs")
+    for ax in (mean_ax, regions_ax):
+        ax.axvline(x=0.5, color='red', linestyle='--')  # Nominal 50% duty cycle
+    widths_ax.hist(odd_widths, bins=40, color='r', alpha=0.6, label="Actively Poled (Odd)")
+    widths_ax.hist(even_widths, bins=40, color='b', alpha=0.6, label="Passively Poled (Even)")
+    widths_ax.set_title("Region Widths")
+    widths_ax.set_xlabel(f"Width ({units})")
+    widths_ax.set_ylabel("Regions")
+    widths_ax.legend()
+    for ax in (mean_ax, regions_ax, widths_ax):
+        ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(histogram_path)
+
+
+def write_index(entries, report_dir, histogram_path):
+    def link(path):
+        return html.escape(os.path.relpath(path, report_dir).replace(os.sep, "/"))
+
+    rows = []
+    for entry in entries:
+        results = entry["results"]
+        unit = "µm" if results["calibrated"] else "px"
+        thumbnail = f'<img src="{link(entry["thumbnail_path"])}">' if entry["image_path"] else ""
+        rows.append(
+            "<tr>"
+            f"<td>{thumbnail}</td>"
+            f"<td>{html.escape(entry['name'])}</td>"
+            f"<td>{len(results['duty_cycle'])}</td>"
+            f"<td>{results['odd_mean']:.3f} ± {results['odd_std']:.3f} {unit}</td>"
+            f"<td>{results['even_mean']:.3f} ± {results['even_std']:.3f} {unit}</td>"
+            f"<td>{results['duty_cycle_mean']:.3f} ± {results['duty_cycle_std']:.3f}</td>"
+            f'<td><a href="{link(entry["widths_plot_path"])}">widths</a> '
+            f'<a href="{link(entry["duty_cycle_plot_path"])}">duty cycle</a> '
+            f'<a href="{link(entry["analysis_data_path"])}">data</a></td>'
+            "</tr>"
+        )
+    duty_cycle_means = [entry["results"]["duty_cycle_mean"] for entry in entries]
+    summary = (f"{len(entries)} images, mean duty cycle {np.mean(duty_cycle_means):.3f} ± {np.std(duty_cycle_means):.3f}"
+               if entries else "No analyzed images")
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>PPLN Analysis Report</title>
+<style>
+body {{ font-family: sans-serif; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; }}
+</style>
+</head>
+<body>
+<h1>PPLN Analysis Report</h1>
+<p>{html.escape(summary)}</p>
+<img src="{link(histogram_path)}">
+<table>
+<tr><th>Thumbnail</th><th>Image</th><th>Region Pairs</th><th>Odd Width</th><th>Even Width</th><th>Duty Cycle</th><th>Files</th></tr>
+{chr(10).join(rows)}
+</table>
+</body>
+</html>
+"""
+    index_path = os.path.join(report_dir, "index.html")
+    with open(index_path, 'w', encoding='utf-8') as index_file:
+        index_file.write(page)
+    return index_path
+
+
+def generate_report(directory, processes=None):
+    report_dir = os.path.join(directory, "report")
+    thumbnail_dir = os.path.join(report_dir, "thumbnails")
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    manifest_path = os.path.join(report_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+
+    entries, jobs = [], []
+    for analysis_data_path in sorted(glob.glob(os.path.join(glob.escape(directory), "*" + DATA_SUFFIX))):
+        image_file_name = os.path.basename(analysis_data_path)[:-len(DATA_SUFFIX)]
+        image_path = find_image(directory, image_file_name)
+        widths_plot_path, duty_cycle_plot_path, _ = results_io.output_paths(directory, image_file_name)
+        entry = {
+            "name": os.path.basename(image_path) if image_path else image_file_name,
+            "image_path": image_path,
+            "analysis_data_path": analysis_data_path,
+            "widths_plot_path": widths_plot_path,
+            "duty_cycle_plot_path": duty_cycle_plot_path,
+            "thumbnail_path": os.path.join(thumbnail_dir, image_file_name + ".png"),
+            "results": load_analysis_data(analysis_data_path),
+        }
+        entries.append(entry)
+
+        # Skip the render when the results (units included) are the same as last time and the files are still there
+        digest = file_hash(analysis_data_path)
+        outputs = [widths_plot_path, duty_cycle_plot_path] + ([entry["thumbnail_path"]] if image_path else [])
+        if manifest.get(image_file_name) == digest and all(os.path.exists(path) for path in outputs):
+            continue
+        manifest[image_file_name] = digest
+        jobs.append({key: value for key, value in entry.items() if key != "results"})
+
+    print(f"Rendering plots for {len(jobs)} of {len(entries)} image(s)")
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for name in executor.map(render_job, jobs):
+                print(f"Rendered {name}")
+    else:
+        for job in jobs:
+            render_job(job)
+
+    histogram_path = os.path.join(report_dir, "histograms.png")
+    render_histograms(entries, histogram_path)
+    index_path = write_index(entries, report_dir, histogram_path)
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    print(f"Report written to {index_path}")
+    return index_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the plots and an HTML report for a directory of analyzed images.")
+    parser.add_argument("directory", help="Directory with the images and their *_analysis_data.csv files")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    generate_report(args.directory, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Writing analysis results to disk: the per-image analysis data CSV, the
+exported figures and the row appended to the main CSV database.
+
+Used by ImageController.save_results and by the unattended batch runner.
+"""
+import csv
+import os
+from datetime import datetime
+
+import aggregates
+import plotting
+
+
+def load_database_location(config_file="config.ini"):
+    import configparser
+    config = configparser.ConfigParser()
+    if os.path.exists(config_file):  # Check if the config file exists
+        config.read(config_file)
+    if "Database" in config and "file" in config["Database"]:
+        return config["Database"]["file"]
+    else:
+        return "analysis_results.csv"  # Default file name
+
+
+def output_paths(image_dir, image_file_name):
+    # Paths for the plots and analysis data, saved alongside the image
+    base = os.path.join(image_dir, os.path.splitext(image_file_name)[0])
+    return f"{base}_widths.png", f"{base}_duty_cycle.png", f"{base}_analysis_data.csv"
+
+
+def database_row(metadata, rotation_angle, image_file_name, results, description=""):
+    # The info fields first, then the analysis summary, then the Description last
+    data = dict(metadata)
+    data["Rotation Angle"] = rotation_angle
+    data["Image File Name"] = image_file_name
+    data["Analysis Date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    data.update({
+        "Mean Odd Region Width (µm)": results["odd_mean"],
+        "Std Odd Region Width (µm)": results["odd_std"],
+        "Mean Even Region Width (µm)": results["even_mean"],
+        "Std Even Region Width (µm)": results["even_std"],
+        "Mean Duty Cycle": results["duty_cycle_mean"],
+        "Std Duty Cycle": results["duty_cycle_std"],
+        "Lines Averaged in ROI": results["lines_averaged"]
+    })
+    data["Description"] = description
+    return data
+
+
+def write_analysis_data(analysis_data_path, results, calibrated):
+    # Detailed analysis data (region widths and duty cycle) followed by the summary stats.
+    # The Units row records whether the widths are calibrated, the header always says µm.
+    with open(analysis_data_path, 'w', newline='') as csvfile:
+        fieldnames = ["Region Number", "Odd Region Width (µm)", "Even Region Width (µm)", "Duty Cycle"]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for i in range(len(results["odd_region_widths"])):
+            writer.writerow({
+                "Region Number": i + 1,
+                "Odd Region Width (µm)": results["odd_region_widths"][i],
+                "Even Region Width (µm)": results["even_region_widths"][i],
+                "Duty Cycle": results["duty_cycle"][i]
+            })
+        writer.writerow({})
+        writer.writerow({"Region Number": "Mean Odd Region Width (µm)", "Odd Region Width (µm)": results["odd_mean"]})
+        writer.writerow({"Region Number": "Std Odd Region Width (µm)", "Odd Region Width (µm)": results["odd_std"]})
+        writer.writerow({"Region Number": "Mean Even Region Width (µm)", "Even Region Width (µm)": results["even_mean"]})
+        writer.writerow({"Region Number": "Std Even Region Width (µm)", "Even Region Width (µm)": results["even_std"]})
+        writer.writerow({"Region Number": "Mean Duty Cycle", "Duty Cycle": results["duty_cycle_mean"]})
+        writer.writerow({"Region Number": "Std Duty Cycle", "Duty Cycle": results["duty_cycle_std"]})
+        writer.writerow({"Region Number": "Units", "Odd Region Width (µm)": "microns" if calibrated else "pixels"})
+    print(f"Analysis data saved to {analysis_data_path}")
+
+
+def write_figures(widths_plot_path, duty_cycle_plot_path, results, calibrated):
+    # Render the figures off-screen from the stored results
+    plotting.widths_figure(results, calibrated).savefig(widths_plot_path)
+    print(f"Widths plot saved to {widths_plot_path}")
+    plotting.duty_cycle_figure(results).savefig(duty_cycle_plot_path)
+    print(f"Duty cycle plot saved to {duty_cycle_plot_path}")
+
+
+def append_to_database(csv_file, data):
+    # Open the running statistics before appending, so they are checked against the database as it was
+    store = aggregates.AggregateStore(csv_file)
+
+    # Write the header only when the database is created
+    write_header = not os.path.exists(csv_file)
+    with open(csv_file, 'w' if write_header else 'a', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=data.keys())
+        if write_header:
+            writer.writeheader()
+        writer.writerow(data)
+    print("Results saved to", csv_file)
+
+    store.update(data)
+    store.save()
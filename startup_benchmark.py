@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Startup-time benchmark for the GUI and the headless entry points.
+
+Each entry module is imported in a fresh interpreter (as the GUI and every
+batch worker process would be), and the import time and the heavy packages
+that got loaded are reported. The run fails (exit code 1) when an import is
+over budget or pulls in one of the packages that must only be loaded on
+first use.
+
+Usage:
+    python startup_benchmark.py [--repeat 5] [--budget-ms 400]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ENTRY_MODULES = ("main", "controller", "view", "model", "batch", "analysis", "recipe", "results_io", "aggregates", "report")
+
+# Packages that must not be imported just by importing an entry module
+LAZY_PACKAGES = ("matplotlib", "scipy", "skimage", "pandas", "configparser")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    # Best of `repeat` runs, each in a new interpreter
+    best = None
+    loaded = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, lazy=LAZY_PACKAGES)],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        best = result["seconds"] if best is None else min(best, result["seconds"])
+        loaded = result["loaded"]
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the PPLN analyzer entry points.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per module, the fastest one is reported")
+    parser.add_argument("--budget-ms", type=float, default=400, help="Maximum import time per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in ENTRY_MODULES:
+        seconds, loaded = measure(module, args.repeat)
+        over_budget = seconds * 1000 > args.budget_ms
+        status = "FAIL" if over_budget or loaded else "ok"
+        failed = failed or status == "FAIL"
+        print(f"{module:<12} {seconds * 1000:8.1f} ms  {status}" + (f"  (loaded eagerly: {', '.join(loaded)})" if loaded else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the running group statistics sidecar of the results database.
+
+Run with:
+    python -m pytest -q
+"""
+import pytest
+
+import aggregates
+import results_io
+
+
+def row(chip, duty_cycle):
+    return {
+        "Chip#": chip,
+        "Applied Voltage (mV)": "500",
+        "Mean Duty Cycle": duty_cycle,
+        "Mean Odd Region Width (µm)": 2 * duty_cycle,
+        "Mean Even Region Width (µm)": 2 * (1 - duty_cycle),
+    }
+
+
+@pytest.fixture
+def database(tmp_path):
+    csv_file = str(tmp_path / "results.csv")
+    for chip, duty_cycle in (("1", 0.4), ("1", 0.6), ("2", 0.5)):
+        results_io.append_to_database(csv_file, row(chip, duty_cycle))
+    return csv_file
+
+
+def test_statistics_follow_the_database(database):
+    (key, count, mean, std), _ = aggregates.AggregateStore(database).query("Chip")
+    assert (key, count) == ("1", 2)
+    assert mean == pytest.approx(0.5)
+    assert std == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("content", ['{"database_size": 12, "gro', "", "[]", '{"groups": 3}'])
+def test_unreadable_sidecar_is_rebuilt(database, content):
+    with open(aggregates.stats_path(database), 'w') as stats_file:
+        stats_file.write(content)
+    # Saving must not be blocked by the broken sidecar
+    results_io.append_to_database(database, row("2", 0.7))
+    query = aggregates.AggregateStore(database).query("Chip")
+    assert [(key, count) for key, count, _, _ in query] == [("1", 2), ("2", 2)]
+    assert query[1][2] == pytest.approx(0.6)
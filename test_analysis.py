@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Regression tests of the analysis engines on synthetic gratings.
+
+Run with:
+    python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+import analysis
+
+
+def grating(period, duty_cycle, length=3000, noise=0.0, start=5.0, depth=40, wall_width=1.2, seed=0):
+    # Line profile of a poled grating: a dark Gaussian dip at every domain
+    # wall, the odd region starting at `start`. `duty_cycle` may also be a
+    # function of the position along the profile (0 to 1).
+    x = np.arange(length)
+    profile = np.full(length, 150.0)
+    position = start - period
+    while position < length + period:
+        duty = duty_cycle(position / length) if callable(duty_cycle) else duty_cycle
+        for wall in (position, position + duty * period):
+            profile -= depth * np.exp(-0.5 * ((x - wall) / wall_width) ** 2)
+        position += period
+    return profile + np.random.default_rng(seed).normal(0, noise, length)
+
+
+def check(results, period, duty_cycle, tolerance=0.02):
+    assert results["duty_cycle_mean"] == pytest.approx(duty_cycle, abs=tolerance)
+    assert results["odd_mean"] + results["even_mean"] == pytest.approx(period, rel=0.02)
+
+
+@pytest.mark.parametrize("period, duty_cycle, length", [
+    (12, 0.5, 3000),
+    (13, 0.5, 3000),
+    (14.7, 0.5, 3000),
+    (100, 0.5, 800),
+    (69, 0.55, 3000),
+    (69, 0.55, 800),
+    (20.3, 0.4, 3000),
+    (20.3, 0.6, 3000),
+    (30, 0.55, 3000),
+    (25, 0.3, 3000),
+    (20, 0.47, 3000),
+    (100, 0.3, 800),
+])
+@pytest.mark.parametrize("noise", [0, 3])
+def test_fourier_clean_gratings(period, duty_cycle, length, noise):
+    check(analysis.analyze_fourier(grating(period, duty_cycle, length, noise)), period, duty_cycle)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_fourier_noise_is_not_a_subharmonic(seed):
+    # A noisy bin below the dominant peak must not multiply the period
+    check(analysis.analyze_fourier(grating(100, 0.5, 800, noise=8, seed=seed)), 100, 0.5)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_fourier_drift_across_half(seed):
+    # Near 50% the fundamental cancels out: the windows must still follow the drift
+    results = analysis.analyze_fourier(grating(20.3, lambda x: 0.44 + 0.12 * x, noise=2, seed=seed))
+    check(results, 20.3, 0.5)
+    assert results["duty_cycle"][0] == pytest.approx(0.44, abs=0.02)
+    assert results["duty_cycle"][-1] == pytest.approx(0.56, abs=0.02)
+    assert results["duty_cycle_std"] > 0.02
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_fourier_jitter_around_half(seed):
+    jitter = np.random.default_rng(seed + 10).normal(0, 0.03, 200)
+    results = analysis.analyze_fourier(grating(20.3, lambda x: 0.5 + jitter[int(x * 147)], noise=2, seed=seed))
+    check(results, 20.3, 0.5)
+    assert results["duty_cycle_std"] > 0.005
+
+
+def test_fourier_step_across_half():
+    results = analysis.analyze_fourier(grating(20.3, lambda x: 0.35 if x < 0.5 else 0.6, noise=2))
+    assert results["odd_mean"] + results["even_mean"] == pytest.approx(20.3, rel=0.02)
+    assert results["duty_cycle"][0] == pytest.approx(0.35, abs=0.02)
+    assert results["duty_cycle"][-1] == pytest.approx(0.6, abs=0.02)
+
+
+def test_fourier_calibration():
+    results = analysis.analyze_fourier(grating(20.3, 0.4, noise=1), calibration_factor=0.14)
+    assert results["odd_mean"] == pytest.approx(0.4 * 20.3 * 0.14, rel=0.02)
+    assert results["even_mean"] == pytest.approx(0.6 * 20.3 * 0.14, rel=0.02)
+
+
+def test_fourier_rejects_short_profiles():
+    with pytest.raises(ValueError, match="too short"):
+        analysis.analyze_fourier(grating(4, 0.5, length=analysis.MIN_PROFILE_LENGTH - 1))
+
+
+@pytest.mark.parametrize("length", range(analysis.MIN_PROFILE_LENGTH, 80))
+def test_fourier_short_profiles(length):
+    # Anything from the minimum length up gives a result, even without a grating
+    rng = np.random.default_rng(length)
+    for profile in (grating(5, 0.5, length), rng.normal(0, 1, length), np.linspace(0, 10, length)):
+        assert np.all(np.isfinite(analysis.analyze_fourier(profile)["duty_cycle"]))
+
+
+def test_engines_return_the_same_keys():
+    profile = grating(20.3, 0.4, noise=3)
+    minima = analysis.run_engine("Minima", profile)
+    fourier = analysis.run_engine("Fourier", profile)
+    assert set(minima) == set(fourier)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the incremental ROI profile against a full recomputation.
+
+Run with:
+    python -m pytest -q
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from model import RunningRoiProfile
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+def test_running_profile_matches_the_slice_mean(dtype):
+    rng = np.random.default_rng(0)
+    image_array = rng.integers(0, np.iinfo(dtype).max, (300, 400), dtype=dtype, endpoint=True)
+    running_profile = RunningRoiProfile(Image.fromarray(image_array))
+    top, bottom = 100, 140
+    for _ in range(2000):
+        if rng.random() < 0.1:
+            # Jump anywhere, sometimes past the image edges
+            top, bottom = rng.integers(-50, 350, 2)
+        else:
+            # Drag one of the handles or the whole ROI by a few rows
+            top, bottom = np.array((top, bottom)) + rng.integers(-5, 6, 2) * (rng.random(2) < 0.7)
+        running_profile.set_rows(top, bottom)
+        t, b = sorted(np.clip((top, bottom), 0, 300))
+        assert (running_profile.top, running_profile.bottom) == (t, b)
+        if b > t:
+            np.testing.assert_array_equal(running_profile.profile(0, 0), image_array[t:b].mean(0))
+            np.testing.assert_array_equal(running_profile.profile(20, 30), image_array[t:b, 20:370].mean(0))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Registration of recipes on synthetic chip images.
+
+Run with:
+    python -m pytest -q
+"""
+import numpy as np
+import pytest
+from PIL import Image
+from scipy.ndimage import rotate, shift
+
+from recipe import Recipe
+
+ROI_ROWS = (204, 252)
+
+
+def chip(height=600, width=800, seed=1):
+    # Chip layout of horizontal bands with a poling grating in the ROI rows
+    rows, columns = np.mgrid[:height, :width]
+    image = np.full((height, width), 150.0)
+    for top, bottom, value in ((48, 120, 80), (348, 378, 40), (450, 522, -30)):
+        image[top:bottom] += value
+    grating = (rows >= 198) & (rows < 258)
+    image[grating] -= 40 * (np.sin(2 * np.pi * columns[grating] / 20) > 0.3)
+    return image + np.random.default_rng(seed).normal(0, 3, image.shape)
+
+
+def to_image(image_array):
+    return Image.fromarray(np.clip(image_array, 0, 255).astype(np.uint8))
+
+
+@pytest.fixture
+def reference_path(tmp_path):
+    path = tmp_path / "reference.tif"
+    to_image(chip()).save(path)
+    return str(path)
+
+
+def moved(tilt, rows):
+    # The chip moved down by `rows` and tilted by `tilt` degrees, which
+    # rotating the image by `tilt` undoes
+    return to_image(rotate(shift(chip(), (rows, 0), order=1, mode="nearest"), -tilt, reshape=False, order=1, mode="nearest"))
+
+
+@pytest.mark.parametrize("tilt", [0, 0.3, 0.8, -1.5, 2.0])
+@pytest.mark.parametrize("rows", [0, -8, 12])
+def test_register_shift_and_tilt(reference_path, tilt, rows):
+    recipe = Recipe(roi_rows=ROI_ROWS, reference_image=reference_path)
+    rotation_angle, roi_rows = recipe.register(moved(tilt, rows))
+    assert rotation_angle == pytest.approx(tilt, abs=0.05)
+    assert roi_rows[0] == pytest.approx(ROI_ROWS[0] + rows, abs=1)
+    assert roi_rows[1] - roi_rows[0] == ROI_ROWS[1] - ROI_ROWS[0]
+
+
+def test_register_from_a_rotated_recipe(reference_path):
+    # The recipe was authored on a tilted reference: only the change is registered
+    reference = to_image(rotate(chip(), -2, reshape=False, order=1, mode="nearest"))
+    reference.save(reference_path)
+    recipe = Recipe(rotation_angle=2, roi_rows=ROI_ROWS, reference_image=reference_path)
+    rotation_angle, roi_rows = recipe.register(moved(2.3, -8))
+    assert rotation_angle == pytest.approx(2.3, abs=0.05)
+    assert roi_rows[0] == pytest.approx(ROI_ROWS[0] - 8, abs=1)
+
+
+def test_saved_recipe_registers_without_the_reference(reference_path, tmp_path):
+    recipe_path = tmp_path / "recipe.ini"
+    Recipe(roi_rows=ROI_ROWS, reference_image=reference_path).save(recipe_path)
+    (tmp_path / "reference.tif").unlink()
+    rotation_angle, roi_rows = Recipe.load(recipe_path).register(moved(0.8, 12))
+    assert rotation_angle == pytest.approx(0.8, abs=0.05)
+    assert roi_rows[0] == pytest.approx(ROI_ROWS[0] + 12, abs=1)
+
+
+def test_missing_reference_is_not_registered(tmp_path):
+    recipe = Recipe(rotation_angle=1.5, roi_rows=ROI_ROWS, reference_image=str(tmp_path / "moved.tif"))
+    assert recipe.register(moved(0.8, 12)) == (1.5, ROI_ROWS)
+
+
+def test_load_rejects_files_without_a_recipe(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_text("[Settings]\nvalue = 1\n")
+    with pytest.raises(ValueError, match="not a recipe file"):
+        Recipe.load(path)
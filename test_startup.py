@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+Importing an entry module must not load the heavy packages, see startup_benchmark.py.
+
+Run with:
+    python -m pytest -q
+"""
+import pytest
+
+import startup_benchmark
+
+
+@pytest.mark.parametrize("module", startup_benchmark.ENTRY_MODULES)
+def test_no_eager_heavy_imports(module):
+    _, loaded = startup_benchmark.measure(module, repeat=1)
+    assert loaded == []
@@ -2,9 +2,218 @@ import tkinter as tk
 from tkinter import filedialog
 from tkinter import ttk
 from PIL import ImageTk, Image, ImageDraw
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
+from analysis import ENGINES
+from aggregates import GROUPINGS, METRICS
+
+
+class PlotPanel:
+    """Persistent plot panel embedded in the Tk window.
+
+    The profile, minima, region widths and duty cycle are drawn once as
+    artists and afterwards only updated with set_data. When the new data fits
+    inside the current axis limits the panel blits the changed artists over a
+    cached background instead of redrawing the whole figure.
+    """
+
+    def __init__(self, master):
+        # matplotlib and its Tk backend are only loaded once the window is up
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.figure = Figure(figsize=(6, 8), dpi=100, constrained_layout=True)
+        self.profile_ax, self.widths_ax, self.duty_cycle_ax = self.figure.subplots(3, 1)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        # Line profile with minima marked
+        self.profile_line, = self.profile_ax.plot([], [], label="Line Profile", animated=True)
+        self.minima_markers, = self.profile_ax.plot([], [], 'rx', label="Minima", animated=True)
+        self.profile_ax.set_title("Line Profile")
+        self.profile_ax.set_xlabel("Pixel")
+        self.profile_ax.set_ylabel("Intensity")
+        self.profile_ax.grid(True)
+        self.profile_ax.legend(loc="upper right")
+
+        # Widths of odd and even regions
+        self.odd_line, = self.widths_ax.plot([], [], 'ro-', label="Actively Poled (Odd)", animated=True)
+        self.even_line, = self.widths_ax.plot([], [], 'bo-', label="Passively Poled (Even)", animated=True)
+        self.odd_mean_line = self.widths_ax.axhline(y=0, color='black', linestyle='--', visible=False, animated=True)
+        self.even_mean_line = self.widths_ax.axhline(y=0, color='black', linestyle='--', visible=False, animated=True)
+        self.widths_text = self.widths_ax.text(0.02, 0.95, "", transform=self.widths_ax.transAxes, va='top', fontsize=8, animated=True)
+        self.widths_ax.set_title("Region Widths")
+        self.widths_ax.set_xlabel("Region Number")
+        self.widths_ax.set_ylabel("Width (Pixels)")
+        self.widths_ax.grid(True)
+        self.widths_ax.legend(loc="upper right")
+
+        # Duty cycle
+        self.duty_cycle_line, = self.duty_cycle_ax.plot([], [], 'mo-', label="Duty Cycle", animated=True)
+        self.duty_cycle_mean_line = self.duty_cycle_ax.axhline(y=0, color='black', linestyle='--', visible=False, animated=True)
+        self.duty_cycle_ax.axhline(y=0.5, color='red', linestyle='--')  # Nominal 50% duty cycle
+        self.duty_cycle_text = self.duty_cycle_ax.text(0.02, 0.95, "", transform=self.duty_cycle_ax.transAxes, va='top', fontsize=8, animated=True)
+        self.duty_cycle_ax.set_ylim(0, 1)
+        self.duty_cycle_ax.set_title("Duty Cycle")
+        self.duty_cycle_ax.set_xlabel("Region Pair Number")
+        self.duty_cycle_ax.set_ylabel("Duty Cycle (Odd / (Odd + Even))")
+        self.duty_cycle_ax.grid(True)
+        self.duty_cycle_ax.legend(loc="upper right")
+
+        self.animated_artists = [
+            self.profile_line, self.minima_markers,
+            self.odd_line, self.even_line, self.odd_mean_line, self.even_mean_line, self.widths_text,
+            self.duty_cycle_line, self.duty_cycle_mean_line, self.duty_cycle_text,
+        ]
+        self.background = None
+        self._refresh_pending = False
+        self._full_redraw = False
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        # Cache everything static, then paint the animated artists on top
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.animated_artists:
+            self.figure.draw_artist(artist)
+
+    def _fit_limits(self, ax, x, y):
+        # Returns True when the axis limits had to change (and thus the background is stale)
+        if len(x) == 0:
+            return False
+        x_min, x_max = float(np.min(x)), float(np.max(x))
+        y_min, y_max = float(np.min(y)), float(np.max(y))
+        x_pad = (x_max - x_min) * 0.02 or 1
+        y_pad = (y_max - y_min) * 0.05 or 1
+        cur_x_min, cur_x_max = ax.get_xlim()
+        cur_y_min, cur_y_max = ax.get_ylim()
+        contained = cur_x_min <= x_min and x_max <= cur_x_max and cur_y_min <= y_min and y_max <= cur_y_max
+        # Refit when the data has shrunk to a small part of the current view as well
+        too_loose = (x_max - x_min) < 0.5 * (cur_x_max - cur_x_min) or (y_max - y_min) < 0.3 * (cur_y_max - cur_y_min)
+        if contained and not too_loose:
+            return False
+        ax.set_xlim(x_min - x_pad, x_max + x_pad)
+        ax.set_ylim(y_min - y_pad, y_max + y_pad)
+        return True
+
+    def request_refresh(self, full=False):
+        # Several updates in one pass of the event loop (profile and results) share a single blit
+        self._full_redraw = self._full_redraw or full
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.canvas.get_tk_widget().after_idle(self._refresh)
+
+    def _refresh(self):
+        full = self._full_redraw
+        self._refresh_pending = False
+        self._full_redraw = False
+        self.refresh(full)
+
+    def refresh(self, full=False):
+        if full or self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+        self.canvas.flush_events()
+
+    def update_profile(self, x_axis, line_profile, xlabel="Pixel", title="Line Profile", minima_indices=None):
+        self.profile_line.set_data(x_axis, line_profile)
+        if minima_indices is None:
+            self.minima_markers.set_data([], [])
+        else:
+            self.minima_markers.set_data(x_axis[minima_indices], line_profile[minima_indices])
+        full = self._fit_limits(self.profile_ax, x_axis, line_profile)
+        if self.profile_ax.get_xlabel() != xlabel or self.profile_ax.get_title() != title:
+            self.profile_ax.set_xlabel(xlabel)
+            self.profile_ax.set_title(title)
+            full = True
+        self.request_refresh(full)
+
+    def update_results(self, results, calibrated):
+        odd_region_widths = results["odd_region_widths"]
+        even_region_widths = results["even_region_widths"]
+        duty_cycle = results["duty_cycle"]
+        unit = "µm" if calibrated else "px"
+
+        self.odd_line.set_data(np.arange(1, len(odd_region_widths) + 1), odd_region_widths)
+        self.even_line.set_data(np.arange(1, len(even_region_widths) + 1), even_region_widths)
+        self.odd_mean_line.set_ydata([results["odd_mean"]] * 2)
+        self.even_mean_line.set_ydata([results["even_mean"]] * 2)
+        self.widths_text.set_text(f"Odd: {results['odd_mean']:.2f} ± {results['odd_std']:.2f} {unit}\n"
+                                  f"Even: {results['even_mean']:.2f} ± {results['even_std']:.2f} {unit}")
+        self.duty_cycle_line.set_data(np.arange(1, len(duty_cycle) + 1), duty_cycle)
+        self.duty_cycle_mean_line.set_ydata([results["duty_cycle_mean"]] * 2)
+        self.duty_cycle_text.set_text(f"Mean: {results['duty_cycle_mean']:.2f}, Std: {results['duty_cycle_std']:.2f}")
+        for artist in (self.odd_mean_line, self.even_mean_line, self.duty_cycle_mean_line):
+            artist.set_visible(len(duty_cycle) > 0)
+
+        widths = np.concatenate([odd_region_widths, even_region_widths])
+        full = self._fit_limits(self.widths_ax, np.arange(len(odd_region_widths) + 1), widths if len(widths) else [0])
+        if len(duty_cycle):
+            full = self._fit_limits(self.duty_cycle_ax, np.arange(len(duty_cycle) + 1), [0, 1]) or full
+            self.duty_cycle_ax.set_ylim(0, 1)  # Duty cycle always stays on a 0..1 scale
+        ylabel = "Width (Microns)" if calibrated else "Width (Pixels)"
+        if self.widths_ax.get_ylabel() != ylabel:
+            self.widths_ax.set_ylabel(ylabel)
+            full = True
+        self.request_refresh(full)
+
+class TrendDashboard:
+    """Window with trends of the running group statistics of the results database."""
+
+    def __init__(self, root, store):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.store = store
+        self.window = tk.Toplevel(root)
+        self.window.title("Trends")
+
+        controls = tk.Frame(self.window)
+        controls.pack(side=tk.TOP, fill=tk.X)
+        tk.Label(controls, text="Group by:").pack(side=tk.LEFT)
+        self.grouping_var = tk.StringVar(value=next(iter(GROUPINGS)))
+        tk.OptionMenu(controls, self.grouping_var, *GROUPINGS, command=self.refresh).pack(side=tk.LEFT)
+        tk.Label(controls, text="Metric:").pack(side=tk.LEFT)
+        self.metric_var = tk.StringVar(value=METRICS[0])
+        tk.OptionMenu(controls, self.metric_var, *METRICS, command=self.refresh).pack(side=tk.LEFT)
+
+        self.figure = Figure(figsize=(8, 6), dpi=100, constrained_layout=True)
+        self.trend_ax, self.histogram_ax = self.figure.subplots(2, 1)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.refresh()
+
+    def refresh(self, *args):
+        grouping = self.grouping_var.get()
+        metric = self.metric_var.get()
+        rows = self.store.query(grouping, metric)
+
+        self.trend_ax.clear()
+        if rows:
+            keys, counts, means, stds = zip(*rows)
+            positions = np.arange(len(keys))
+            self.trend_ax.errorbar(positions, means, yerr=stds, fmt='o-', capsize=3)
+            self.trend_ax.set_xticks(positions)
+            self.trend_ax.set_xticklabels([f"{key}\n(n={count})" for key, count in zip(keys, counts)], rotation=45, ha='right', fontsize=8)
+        self.trend_ax.set_title(f"{metric} by {grouping} (mean ± std)")
+        self.trend_ax.set_ylabel(metric)
+        self.trend_ax.grid(True)
+
+        counts, edges = self.store.histogram(grouping)
+        self.histogram_ax.clear()
+        self.histogram_ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='m', edgecolor='black')
+        self.histogram_ax.axvline(x=0.5, color='red', linestyle='--')  # Nominal 50% duty cycle
+        self.histogram_ax.set_title("Mean Duty Cycle of All Analyses")
+        self.histogram_ax.set_xlabel("Mean Duty Cycle")
+        self.histogram_ax.set_ylabel("Number of Analyses")
+        self.histogram_ax.grid(True)
+        self.canvas.draw_idle()
+
 
 class ImageView:
     def __init__(self, root, controller):
@@ -49,6 +258,12 @@ class ImageView:
         self.text_entries["Description"] = self.description_entry
 
 
+        # Persistent plot panel to the right of the image
+        self.plot_frame = tk.Frame(root)
+        self.plot_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        self._plot_panel = None
+        self.root.after(100, self.build_plot_panel)  # Build it once the window has been shown
+
         # Canvas to display the image
         self.canvas = tk.Canvas(root, width=800, height=600)
         self.canvas.pack()
@@ -72,6 +287,15 @@ class ImageView:
         # Button to analyze poling
         self.analyze_poling_button = tk.Button(self.button_frame, text="Analyze Poling", command=self.controller.analyze_poling)
         self.analyze_poling_button.pack(side=tk.LEFT)
+
+        # Drop-down to choose the analysis engine
+        self.engine_var = tk.StringVar(value="Minima")
+        self.engine_menu = tk.OptionMenu(self.button_frame, self.engine_var, *ENGINES)
+        self.engine_menu.pack(side=tk.LEFT)
+
+        # Button to run all engines on the current profile and compare them
+        self.compare_engines_button = tk.Button(self.button_frame, text="Compare Engines", command=self.controller.compare_engines)
+        self.compare_engines_button.pack(side=tk.LEFT)
         
 
         # Frame to hold checkboxes and nominal period text box horizontally
@@ -126,7 +350,7 @@ class ImageView:
         self.rotation_frame.pack()
         self.rotation_label = tk.Label(self.rotation_frame, text="Rotate Image:")
         self.rotation_label.pack(side=tk.LEFT)
-        self.rotation_slider = tk.Scale(self.rotation_frame, from_=-180, to=180, resolution=0.1, length=400, orient=tk.HORIZONTAL, command=self.controller.rotate_image)
+        self.rotation_slider = tk.Scale(self.rotation_frame, from_=-180, to=180, resolution=0.1, length=400, orient=tk.HORIZONTAL, command=self.controller.rotation_slider_moved)
         self.rotation_slider.pack(side=tk.LEFT)
         self.rotation_entry = tk.Entry(self.rotation_frame, width=5)
         self.rotation_entry.pack(side=tk.LEFT)
@@ -148,11 +372,33 @@ class ImageView:
         self.db_button = tk.Button(self.button_frame, text="Select Database Location", command=self.controller.select_database_location)
         self.db_button.pack(side=tk.LEFT, padx=5, pady=5)
         
+        # Button to open the trend dashboard over the database
+        self.trends_button = tk.Button(self.button_frame, text="Show Trends", command=self.controller.show_trends)
+        self.trends_button.pack(side=tk.LEFT, padx=5, pady=5)
+        
+        # Recipe buttons: save the current settings, apply them to this image, or run them on a directory
+        self.save_recipe_button = tk.Button(self.button_frame, text="Save Recipe", command=self.controller.save_recipe)
+        self.save_recipe_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.apply_recipe_button = tk.Button(self.button_frame, text="Apply Recipe", command=self.controller.apply_recipe)
+        self.apply_recipe_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.batch_button = tk.Button(self.button_frame, text="Run Recipe on Directory", command=self.controller.run_recipe_on_directory)
+        self.batch_button.pack(side=tk.LEFT, padx=5, pady=5)
+        
         # Button to save results, aligned to the right
         self.save_button = tk.Button(self.button_frame, text="Save Results", command=self.controller.save_results)
         self.save_button.pack(side=tk.RIGHT, padx=5, pady=5)
 
 
+        # Draggable ROI and exclusion handles
+        self.dragged_handle = None
+        for tag, cursor in (("roi_top", "sb_v_double_arrow"), ("roi_bottom", "sb_v_double_arrow"),
+                            ("exclusion_start", "sb_h_double_arrow"), ("exclusion_end", "sb_h_double_arrow")):
+            self.canvas.tag_bind(tag, "<ButtonPress-1>", lambda event, tag=tag: self.start_handle_drag(tag))
+            self.canvas.tag_bind(tag, "<Enter>", lambda event, cursor=cursor: self.canvas.config(cursor=cursor))
+            self.canvas.tag_bind(tag, "<Leave>", lambda event: self.canvas.config(cursor=""))
+        self.canvas.bind("<B1-Motion>", self.drag_handle)
+        self.canvas.bind("<ButtonRelease-1>", self.end_handle_drag)
+
         self.tk_image = None
         self.original_image = None  # Store the original image separately
         self.grid_image = None
@@ -187,6 +433,9 @@ class ImageView:
         if self.calibration_lines:
             self.draw_calibration_lines()
 
+        # Keep the ROI handles above the new image
+        self.canvas.tag_raise("profile_line")
+
         print(f"Image displayed with size: {display_image.size}")
     
     def draw_grid(self):
@@ -216,17 +465,27 @@ class ImageView:
 
     def toggle_grid(self):
         self.grid_active = not self.grid_active
-        self.clear_profile_lines()
-        self.display_image(self.original_image)
-        if self.grid_active:
-            self.draw_grid()
-        if self.calibration_lines:
-            self.draw_calibration_lines()
+        self.canvas.delete("all")
+        self.display_image(self.original_image)  # Draws the grid and the calibration lines
+        self.draw_profile_lines()  # The controller still has the ROI: keep its handles
 
     def clear_profile_lines(self):
         self.profile_lines = []
         self.canvas.delete("all")  # Clears the canvas to remove previous lines
 
+    def build_plot_panel(self):
+        if self._plot_panel is None:
+            self._plot_panel = PlotPanel(self.plot_frame)
+
+    @property
+    def plot_panel(self):
+        # Built right after startup, or here if a plot is requested before that
+        self.build_plot_panel()
+        return self._plot_panel
+
+    def show_trend_dashboard(self, store):
+        self.trend_dashboard = TrendDashboard(self.root, store)
+
     def update_rotation_entry(self, angle):
         self.rotation_entry.delete(0, tk.END)
         self.rotation_entry.insert(0, str(angle))
@@ -254,8 +513,35 @@ class ImageView:
         self.draw_calibration_lines()
 
     def draw_profile_lines(self):
-        for line in self.profile_lines:
-            self.canvas.create_line(line[0], line[1], line[2], line[3], fill="red")
+        self.canvas.delete("profile_line")
+        if len(self.profile_lines) == 2:
+            # ROI mode: the lines double as drag handles, plus vertical handles for the edge exclusions
+            (x_start, y1, x_end, _), (_, y2, _, _) = self.profile_lines
+            self.canvas.create_line(x_start, y1, x_end, y1, fill="red", width=3, tags=("profile_line", "roi_top"))
+            self.canvas.create_line(x_start, y2, x_end, y2, fill="red", width=3, tags=("profile_line", "roi_bottom"))
+            self.canvas.create_line(x_start, y1, x_start, y2, fill="orange", width=3, tags=("profile_line", "exclusion_start"))
+            self.canvas.create_line(x_end, y1, x_end, y2, fill="orange", width=3, tags=("profile_line", "exclusion_end"))
+        else:
+            for line in self.profile_lines:
+                self.canvas.create_line(line[0], line[1], line[2], line[3], fill="red", tags=("profile_line",))
+
+    def start_handle_drag(self, handle):
+        # Clicks belong to the active selection mode (ROI / calibration), if any
+        if self.canvas.bind("<Button-1>"):
+            return
+        self.dragged_handle = handle
+
+    def drag_handle(self, event):
+        if self.dragged_handle:
+            self.controller.drag_roi_handle(self.dragged_handle, event.x, event.y)
+
+    def end_handle_drag(self, event):
+        self.dragged_handle = None
+
+    def set_edge_exclusion(self, start_exclusion, end_exclusion):
+        for entry, value in ((self.start_exclusion_entry, start_exclusion), (self.end_exclusion_entry, end_exclusion)):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
 
     def update_profile_lines(self, y1, y2=None):
         
@@ -266,7 +552,6 @@ class ImageView:
         canvas_width = self.canvas.winfo_width()
         start_exclusion = int(int(self.start_exclusion_entry.get()) * scale_x)
         end_exclusion = int(int(self.end_exclusion_entry.get()) * scale_x)
-        print(f"the scale is: {scale_x}")
         if y2 is None:
             self.profile_lines = [
                 (start_exclusion, y1, canvas_width - end_exclusion, y1)
@@ -284,4 +569,9 @@ class ImageView:
         if self.profile_lines:
             y1 = self.profile_lines[0][1]
             y2 = self.profile_lines[1][1] if len(self.profile_lines) > 1 else None
-            self.update_profile_lines(y1, y2)
+            try:
+                self.update_profile_lines(y1, y2)
+            except ValueError:
+                return  # Entry is being edited and is not a number yet
+            if y2 is not None:
+                self.controller.schedule_live_update()